@@ -0,0 +1,91 @@
+"""Times writing a batch of command uses through ``Commands.bulk_insert`` and through the create() loop it replaced.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_bulk_insert [--rows N] [--repeat N]
+
+Each run gets a fresh in-memory SQLite database from Tortoise with the schema of
+``cogs/models.py``, so this times the ``bulk_create`` path. ``bulk_insert`` also upserts the
+rollups, which the create() loop predates. The rows are shaped like the batch ``cogs/stats.py``
+collects.
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, List
+
+import tortoise
+from tortoise import Tortoise
+
+from cogs.models import Commands
+
+
+def synthetic_batch(rows: int, rng: random.Random) -> List[dict]:
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    guilds = [None, *(rng.randrange(10**17, 10**18) for _ in range(20))]
+    return [
+        {
+            'guild': rng.choice(guilds),
+            'channel': rng.randrange(10**17, 10**18),
+            'author': rng.randrange(10**17, 10**17 + 500),
+            'used': start + datetime.timedelta(seconds=n * 5),
+            'prefix': '!',
+            'command': rng.choice(['wiki', 'help', 'stats', 'ping', 'search']),
+            'failed': rng.random() < .02,
+            'app_command': rng.random() < .5,
+            'is_guild_install': True,
+            'is_user_install': rng.random() < .1,
+            'args': ['Parsnip'],
+            'kwargs': {},
+            'command_id': n,
+            'transaction_id': None,
+        }
+        for n in range(rows)
+    ]
+
+
+async def create_loop(batch: List[dict]) -> None:
+    # what bulk_insert did before, a round trip per command
+    for data in batch:
+        await Commands.create(**Commands._bulk_row(data))
+
+
+async def timed_insert(insert: Callable[[List[dict]], Awaitable[None]], batch: List[dict], repeat: int) -> float:
+    """Median seconds ``insert`` takes to write ``batch`` into an empty database."""
+    times = []
+    for _ in range(repeat):
+        await Tortoise.init(db_url='sqlite://:memory:', modules={'my_app': ['cogs.models']})
+        try:
+            await Tortoise.generate_schemas()
+            start = time.perf_counter()
+            await insert(batch)
+            times.append(time.perf_counter() - start)
+            assert await Commands.all().count() == len(batch)
+        finally:
+            await Tortoise.close_connections()
+    return statistics.median(times)
+
+
+async def bench(rows: int, repeat: int) -> None:
+    batch = synthetic_batch(rows, random.Random(5))
+    print(f'tortoise {tortoise.__version__}, python {sys.version.split()[0]}, {rows} rows, median of {repeat}\n')
+    print(f"{'insert':<14}{'s':>8}{'rows/s':>10}")
+    for name, insert in (('create() loop', create_loop), ('bulk_insert', Commands.bulk_insert)):
+        elapsed = await timed_insert(insert, batch, repeat)
+        print(f'{name:<14}{elapsed:>8.2f}{rows / elapsed:>10.0f}')
+
+
+def main(argv=None) -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument('--rows', type=int, default=10_000)
+    args.add_argument('--repeat', type=int, default=3)
+    options = args.parse_args(argv)
+    asyncio.run(bench(options.rows, options.repeat))
+
+
+if __name__ == '__main__':
+    main()
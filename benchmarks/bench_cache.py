@@ -0,0 +1,46 @@
+"""Times a page cache hit, building the embed from a cached builder and from a cached payload.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cache [--hits N] [--repeat N] [--against REV]
+
+Every saved test page is parsed once and cached both ways. ``--against`` is the git revision
+of ``src/cache.py`` whose ``CachedPage`` held the ``EmbedBuilder``, the commit before hits
+started building from the payload.
+"""
+import argparse
+import sys
+
+import discord
+
+from src import cache, parser
+from src.embed import EmbedBuilder
+
+from .bench_parser import load_pages, module_at, timed
+
+
+def main(argv=None) -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument('--hits', type=int, default=10_000, help='hits timed together per run')
+    args.add_argument('--repeat', type=int, default=5)
+    args.add_argument('--against', metavar='REV', default='f7b4379~1', help='git revision of src/cache.py to compare with')
+    options = args.parse_args(argv)
+
+    old = module_at(options.against, 'src/cache.py', 'old_cache')
+    print(f'discord.py {discord.__version__}, python {sys.version.split()[0]}, {options.hits} hits per run\n')
+    print('microseconds per hit (median)')
+    print(f"{'page':<12}{'fields':>7}{'builder':>10}{'payload':>10}{'same':>7}")
+    for name, html in load_pages().items():
+        builder = EmbedBuilder.from_dict(parser.parse_page(f'https://stardewvalleywiki.com/{name.title()}', html, 'html.parser'))
+        before = old.CachedPage(builder)
+        after = cache.CachedPage(cache.embed_payload(builder))
+        same = before.build().to_dict() == after.build().to_dict()
+        times = [
+            timed(lambda: [page.build() for _ in range(options.hits)], options.repeat) * 1000 / options.hits
+            for page in (before, after)
+        ]
+        print(f"{name:<12}{len(after.payload.get('fields', ())):>7}" + ''.join(f'{elapsed:>10.2f}' for elapsed in times) + f'{str(same):>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Times the infobox emoji lookup against the endswith chains it replaced, over the saved test pages.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_emotes [--repeat N] [--against REV]
+
+Every icon cell ``parse_page`` looks up on a page is recorded, then the same cells are resolved
+by ``emoji_for`` and by ``identify`` from ``src/emotes.py`` at ``--against``, the commit before
+the table. Quality overlays on health, energy and poison icons are counted as ``fixed`` where
+the old chain lost them. Pages with no icon cells are left out.
+"""
+import argparse
+import sys
+from typing import Dict, List, Tuple
+
+import bs4
+
+from src import emotes, parser
+
+from .bench_parser import load_pages, module_at, timed
+
+# what the bot's emojidict holds, so every lookup finds something the way it does live
+EMOJIS = {
+    name: f':{name}:'
+    for name in (*emotes.QUALITY_STARS.values(), *emotes.HEALTH_ENERGY_POISON.values(), *emotes.QUALITY_HEALTH_ENERGY_POISON.values(), 'coin')
+}
+
+
+def icon_cells(url: str, html: str) -> List[Tuple[str, list, str]]:
+    """The ``(background path, foreground divs, page name)`` of every icon cell on the page."""
+    cells = []
+    emoji_for = parser.emoji_for
+
+    def record(back_path, foreimages=None, pagename=None):
+        cells.append((back_path, foreimages, pagename))
+        return emoji_for(back_path, foreimages, pagename)
+
+    parser.emoji_for = record
+    try:
+        parser.parse_page(url, html, 'html.parser')
+    finally:
+        parser.emoji_for = emoji_for
+    return cells
+
+
+def main(argv=None) -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument('--repeat', type=int, default=200)
+    args.add_argument('--against', metavar='REV', default='8327612~1', help='git revision of src/emotes.py to compare with')
+    options = args.parse_args(argv)
+
+    old = module_at(options.against, 'src/emotes.py', 'old_emotes')
+    emotes.emojidict = old.emojidict = EMOJIS # type: ignore
+    print(f'bs4 {bs4.__version__}, python {sys.version.split()[0]}\n')
+    print('microseconds per cell (median)')
+    print(f"{'page':<12}{'cells':>7}{'chain':>9}{'table':>9}{'same':>7}{'fixed':>7}")
+    overlays = {EMOJIS[name] for name in emotes.QUALITY_HEALTH_ENERGY_POISON.values()}
+    pages: Dict[str, List[Tuple[str, list, str]]] = {}
+    for name, html in load_pages().items():
+        if cells := icon_cells(f'https://stardewvalleywiki.com/{name.title()}', html):
+            pages[name] = cells
+    for name, cells in pages.items():
+        before = [old.identify(back, pagename, fore) for back, fore, pagename in cells]
+        after = [emotes.emoji_for(back, fore, pagename) for back, fore, pagename in cells]
+        same = sum(b == a for b, a in zip(before, after))
+        fixed = sum(b != a and a in overlays for b, a in zip(before, after))
+        chain = timed(lambda: [old.identify(back, pagename, fore) for back, fore, pagename in cells], options.repeat) * 1000 / len(cells)
+        table = timed(lambda: [emotes.emoji_for(back, fore, pagename) for back, fore, pagename in cells], options.repeat) * 1000 / len(cells)
+        print(f'{name:<12}{len(cells):>7}{chain:>9.2f}{table:>9.2f}{same:>7}{fixed:>7}')
+
+
+if __name__ == '__main__':
+    main()
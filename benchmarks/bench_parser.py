@@ -0,0 +1,133 @@
+"""Times the wiki page parser over the saved test pages.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parser [--repeat N] [--against REV]
+
+``--against`` also times ``src/parser.py`` as it was at a git revision, such as the commit
+before a parser change, and checks that both give the same embeds.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import types
+from typing import Callable, Dict, Optional
+
+import bs4
+
+from src import parser
+
+PAGES = os.path.join(os.path.dirname(__file__), os.pardir, 'tests', 'fixtures', 'pages')
+
+
+def load_pages() -> Dict[str, str]:
+    pages = {}
+    for name in sorted(os.listdir(PAGES)):
+        with open(os.path.join(PAGES, name), encoding='utf-8') as f:
+            pages[name[:-len('.html')]] = f.read()
+    return pages
+
+
+def timed(func: Callable[[], object], repeat: int) -> float:
+    """Median milliseconds ``func`` takes over ``repeat`` runs."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def module_at(rev: str, path: str, name: str) -> types.ModuleType:
+    """Imports ``path`` as it was at git revision ``rev``, its relative imports resolving against the current ``src``."""
+    source = subprocess.run(['git', 'show', f'{rev}:{path}'], check=True, capture_output=True, text=True).stdout
+    module = types.ModuleType(name)
+    module.__package__ = 'src'
+    module.__file__ = f'{rev}:{path}'
+    exec(compile(source, module.__file__, 'exec'), module.__dict__)
+    return module
+
+
+def old_parser(rev: str) -> types.ModuleType:
+    old = module_at(rev, 'src/parser.py', 'old_parser')
+    # the builder it filled in may have changed shape since
+    old.EmbedBuilder = module_at(rev, 'src/embed.py', 'old_embed').EmbedBuilder # type: ignore
+    return old
+
+
+def extraction_time(html: str, repeat: int) -> float:
+    """Median milliseconds taken to pull the fields out of an already built soup."""
+    times = []
+    for _ in range(repeat):
+        # built fresh every time, quality cells are rewritten while they're read
+        soup = parser.make_soup(html, 'html.parser')
+        pagename = soup.find('h1', {'id': 'firstHeading'}).text # type: ignore
+        start = time.perf_counter()
+        if (infobox := soup.find('table', {'id': 'infoboxtable'})) is not None:
+            for section, detail in parser.scan_infobox(infobox): # type: ignore
+                parser.extract_detail(soup, section, detail, pagename)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def bench_extraction(pages: Dict[str, str], repeat: int, old: Optional[types.ModuleType]) -> None:
+    print('infobox extraction, html.parser, milliseconds (median)')
+    print(f"{'page':<12}{'kB':>7}{'soup':>9}{'fields':>9}" + (f"{'old fields':>12}{'same':>7}" if old else ''))
+    for name, html in pages.items():
+        soup = timed(lambda: parser.make_soup(html, 'html.parser'), repeat)
+        fields = extraction_time(html, repeat)
+        line = f'{name:<12}{len(html) / 1024:>7.0f}{soup:>9.2f}{fields:>9.2f}'
+        if old is not None:
+            url = f'https://stardewvalleywiki.com/{name.title()}'
+            # the old parser always built the whole page with html.parser
+            old_fields = timed(lambda: old.parse_page(url, html), repeat) - soup # type: ignore
+            same = old.parse_page(url, html) == parser.parse_page(url, html, 'html.parser')
+            line += f'{old_fields:>12.2f}{str(same):>7}'
+        print(line)
+
+
+def bench_backends(pages: Dict[str, str], repeat: int) -> None:
+    backends = parser.available_backends()
+    print(f"parse_page by backend, milliseconds (median), installed: {', '.join(backends)}")
+    print(f"{'page':<12}" + ''.join(f'{backend:>14}' for backend in backends) + f"{'same':>7}")
+    for name, html in pages.items():
+        url = f'https://stardewvalleywiki.com/{name.title()}'
+        payloads = {backend: parser.parse_page(url, html, backend) for backend in backends}
+        same = all(payload == payloads['html.parser'] for payload in payloads.values())
+        times = [timed(lambda: parser.parse_page(url, html, backend), repeat) for backend in backends]
+        print(f'{name:<12}' + ''.join(f'{elapsed:>14.2f}' for elapsed in times) + f'{str(same):>7}')
+
+
+def bench_strainers(pages: Dict[str, str], repeat: int) -> None:
+    print('soup building by strainer, milliseconds (median)')
+    print(f"{'page':<12}{'backend':<13}{'whole page':>11}{'lead':>9}{'content':>9}{'strained':>9}")
+    for name, html in pages.items():
+        for backend in parser.available_backends():
+            whole = timed(lambda: parser.make_soup(html, backend), repeat)
+            lead = timed(lambda: parser.make_soup(html, backend, parse_only=parser.LEAD_STRAINER), repeat)
+            content = timed(lambda: parser.make_soup(html, backend, parse_only=parser.CONTENT_STRAINER), repeat)
+            strained = parser.INFOBOX_MARKER in html
+            print(f'{name:<12}{backend:<13}{whole:>11.2f}{lead:>9.2f}{content:>9.2f}{str(strained):>9}')
+
+
+def main(argv=None) -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument('--repeat', type=int, default=20)
+    args.add_argument('--against', metavar='REV', help='git revision of src/parser.py to compare with')
+    options = args.parse_args(argv)
+
+    pages = load_pages()
+    old = old_parser(options.against) if options.against else None
+    print(f'bs4 {bs4.__version__}, python {sys.version.split()[0]}\n')
+    bench_extraction(pages, options.repeat, old)
+    print()
+    bench_backends(pages, options.repeat)
+    print()
+    bench_strainers(pages, options.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""Times the all time stats queries over synthetic command history, raw and through the rollups.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_rollups [--rows N] [--step SECONDS] [--repeat N]
+
+The tables are built in an in-memory SQLite database shaped like ``Commands``, the single
+rollup keyed on every column that the stats used to read, and the narrower ``CommandRollups``
+and ``AuthorRollups`` in ``cogs/models.py``. Authors and commands are Zipf distributed and every
+author has a home guild and an install type, ``--step`` is the seconds between uses. The SQL is the SQLite form of
+what ``cogs/stats.py`` and ``Rollup.backfill`` run.
+"""
+import argparse
+import datetime
+import itertools
+import random
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional
+
+from .bench_parser import timed
+
+SCHEMA = '''
+CREATE TABLE "Commands" (id INTEGER PRIMARY KEY, guild_id BIGINT, author_id BIGINT, used TIMESTAMP, command TEXT, failed BOOL, is_user_install BOOL);
+CREATE INDEX commands_used ON "Commands" (used);
+CREATE INDEX commands_guild_author_command ON "Commands" (guild_id, author_id, command);
+
+CREATE TABLE "WideRollups" (day DATE, guild_id BIGINT, author_id BIGINT, command TEXT, failed BOOL, is_user_install BOOL, uses BIGINT, first_used TIMESTAMP,
+    UNIQUE (day, guild_id, author_id, command, failed, is_user_install));
+CREATE INDEX wide_guild ON "WideRollups" (guild_id);
+CREATE INDEX wide_author ON "WideRollups" (author_id);
+
+CREATE TABLE "CommandRollups" (guild_id BIGINT, command TEXT, is_user_install BOOL, day DATE, uses BIGINT, first_used TIMESTAMP,
+    UNIQUE (guild_id, command, is_user_install, day));
+
+CREATE TABLE "AuthorRollups" (guild_id BIGINT, author_id BIGINT, day DATE, uses BIGINT, first_used TIMESTAMP,
+    UNIQUE (guild_id, author_id, day));
+CREATE INDEX author_rollups_author ON "AuthorRollups" (author_id);
+'''
+
+BACKFILLS = {
+    'WideRollups': '''INSERT INTO "WideRollups" SELECT date(used), COALESCE(guild_id, 0), author_id, command, failed, is_user_install, COUNT(*), MIN(used)
+                      FROM "Commands" GROUP BY 1, 2, 3, 4, 5, 6''',
+    'CommandRollups': '''INSERT INTO "CommandRollups" SELECT COALESCE(guild_id, 0), command, is_user_install, date(used), COUNT(*), MIN(used)
+                         FROM "Commands" GROUP BY 1, 2, 3, 4''',
+    'AuthorRollups': '''INSERT INTO "AuthorRollups" SELECT COALESCE(guild_id, 0), author_id, date(used), COUNT(*), MIN(used)
+                        FROM "Commands" GROUP BY 1, 2, 3''',
+}
+
+TOP = 'ORDER BY "uses" DESC LIMIT 5'
+
+# name -> (raw query, the single wide rollup, what the stats read now), ? is the guild and then the member
+QUERIES = {
+    'guild total': (
+        'SELECT COUNT(*), MIN(used) FROM "Commands" WHERE guild_id=?',
+        'SELECT SUM(uses), MIN(first_used) FROM "WideRollups" WHERE guild_id=?',
+        'SELECT SUM(uses), MIN(first_used) FROM "AuthorRollups" WHERE guild_id=?',
+    ),
+    'guild top commands': (
+        f'SELECT command, COUNT(*) AS "uses" FROM "Commands" WHERE guild_id=? GROUP BY command {TOP}',
+        f'SELECT command, SUM(uses) AS "uses" FROM "WideRollups" WHERE guild_id=? GROUP BY command {TOP}',
+        f'SELECT command, SUM(uses) AS "uses" FROM "CommandRollups" WHERE guild_id=? GROUP BY command {TOP}',
+    ),
+    'guild top users': (
+        f'SELECT author_id, COUNT(*) AS "uses" FROM "Commands" WHERE guild_id=? GROUP BY author_id {TOP}',
+        f'SELECT author_id, SUM(uses) AS "uses" FROM "WideRollups" WHERE guild_id=? GROUP BY author_id {TOP}',
+        f'SELECT author_id, SUM(uses) AS "uses" FROM "AuthorRollups" WHERE guild_id=? GROUP BY author_id {TOP}',
+    ),
+    'member total': (
+        'SELECT COUNT(*), MIN(used) FROM "Commands" WHERE guild_id=? AND author_id=?',
+        'SELECT SUM(uses), MIN(first_used) FROM "WideRollups" WHERE guild_id=? AND author_id=?',
+        'SELECT SUM(uses), MIN(first_used) FROM "AuthorRollups" WHERE guild_id=? AND author_id=?',
+    ),
+    'member top commands': (
+        f'SELECT command, COUNT(*) AS "uses" FROM "Commands" WHERE guild_id=? AND author_id=? GROUP BY command {TOP}',
+        f'SELECT command, SUM(uses) AS "uses" FROM "WideRollups" WHERE guild_id=? AND author_id=? GROUP BY command {TOP}',
+        # no rollup is that fine grained, the stats count the member's rows off the index
+        f'SELECT command, COUNT(*) AS "uses" FROM "Commands" WHERE guild_id=? AND author_id=? GROUP BY command {TOP}',
+    ),
+    'global total': (
+        'SELECT COUNT(*) FROM "Commands"',
+        'SELECT SUM(uses) FROM "WideRollups"',
+        'SELECT SUM(uses) FROM "AuthorRollups"',
+    ),
+    'global top commands': (
+        f'SELECT command, COUNT(*) AS "uses" FROM "Commands" GROUP BY command {TOP}',
+        f'SELECT command, SUM(uses) AS "uses" FROM "WideRollups" GROUP BY command {TOP}',
+        f'SELECT command, SUM(uses) AS "uses" FROM "CommandRollups" GROUP BY command {TOP}',
+    ),
+    'global top guilds': (
+        f'SELECT COALESCE(guild_id, 0), COUNT(*) AS "uses" FROM "Commands" GROUP BY 1 {TOP}',
+        f'SELECT guild_id, SUM(uses) AS "uses" FROM "WideRollups" GROUP BY guild_id {TOP}',
+        f'SELECT guild_id, SUM(uses) AS "uses" FROM "AuthorRollups" GROUP BY guild_id {TOP}',
+    ),
+    'global top users': (
+        f'SELECT author_id, COUNT(*) AS "uses" FROM "Commands" GROUP BY author_id {TOP}',
+        f'SELECT author_id, SUM(uses) AS "uses" FROM "WideRollups" GROUP BY author_id {TOP}',
+        f'SELECT author_id, SUM(uses) AS "uses" FROM "AuthorRollups" GROUP BY author_id {TOP}',
+    ),
+}
+
+
+def zipf(population: list, count: int, rng: random.Random, a: float = 1.1) -> list:
+    weights = list(itertools.accumulate(1 / (rank + 1) ** a for rank in range(len(population))))
+    return rng.choices(population, cum_weights=weights, k=count)
+
+
+def history(rows: int, step: float, rng: random.Random) -> List[tuple]:
+    commands = [f'command{n}' for n in range(60)]
+    guilds: List[Optional[int]] = [rng.randrange(10**17, 10**18) for _ in range(300)]
+    # None for commands used in DMs
+    guilds.append(None)
+    authors = [rng.randrange(10**17, 10**18) for _ in range(5000)]
+    home = {author: rng.choice(guilds) for author in authors}
+    user_install = {author: rng.random() < .1 for author in authors}
+    start = datetime.datetime(2024, 1, 1)
+    return [
+        (home[author], author, (start + datetime.timedelta(seconds=n * step)).isoformat(' '), command, rng.random() < .02, user_install[author])
+        for n, (author, command) in enumerate(zip(zipf(authors, rows, rng), zipf(commands, rows, rng)))
+    ]
+
+
+def build(rows: List[tuple]) -> sqlite3.Connection:
+    db = sqlite3.connect(':memory:')
+    db.executescript(SCHEMA)
+    db.executemany('INSERT INTO "Commands" (guild_id, author_id, used, command, failed, is_user_install) VALUES (?, ?, ?, ?, ?, ?)', rows)
+    print(f"{'table':<16}{'rows':>10}{'backfill s':>12}")
+    print(f"{'Commands':<16}{len(rows):>10}")
+    for table, query in BACKFILLS.items():
+        start = time.perf_counter()
+        db.execute(query)
+        elapsed = time.perf_counter() - start
+        count = db.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        print(f'{table:<16}{count:>10}{elapsed:>12.2f}')
+    db.commit()
+    return db
+
+
+def main(argv=None) -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument('--rows', type=int, default=1_000_000)
+    args.add_argument('--step', type=float, default=60.0, help='seconds between command uses')
+    args.add_argument('--repeat', type=int, default=5)
+    options = args.parse_args(argv)
+
+    rng = random.Random(1)
+    rows = history(options.rows, options.step, rng)
+    print(f'sqlite {sqlite3.sqlite_version}, python {sys.version.split()[0]}, {options.rows} uses {options.step:g}s apart\n')
+    db = build(rows)
+
+    # the busiest guild and its busiest member, the slowest case for the per guild stats
+    guild = db.execute('SELECT guild_id FROM "Commands" WHERE guild_id IS NOT NULL GROUP BY guild_id ORDER BY COUNT(*) DESC LIMIT 1').fetchone()[0]
+    member = db.execute('SELECT author_id FROM "Commands" WHERE guild_id=? GROUP BY author_id ORDER BY COUNT(*) DESC LIMIT 1', (guild,)).fetchone()[0]
+
+    print(f"\nmilliseconds (median of {options.repeat})")
+    print(f"{'query':<22}{'raw':>9}{'wide':>9}{'now':>9}{'same':>7}")
+    for name, queries in QUERIES.items():
+        params = (guild, member)[:queries[0].count('?')]
+        results: Dict[str, list] = {}
+        times = []
+        for query in queries:
+            results[query] = db.execute(query, params).fetchall()
+            times.append(timed(lambda: db.execute(query, params).fetchall(), options.repeat))
+        same = len({repr(result) for result in results.values()}) == 1
+        print(f'{name:<22}' + ''.join(f'{elapsed:>9.2f}' for elapsed in times) + f'{str(same):>7}')
+
+
+if __name__ == '__main__':
+    main()
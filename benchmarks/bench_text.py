@@ -0,0 +1,89 @@
+"""Times the text clean-up in ``src/text.py`` against the code it replaced.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_text [--repeat N]
+"""
+import argparse
+import random
+import re
+import sys
+import urllib.parse
+from typing import Callable, Dict, List
+
+from src import text
+
+from .bench_parser import timed
+
+WORDS = ['Parsnip', 'Spring', 'Pierre\'s', 'General', 'Store', '35g', 'Gold', 'Quality', '(', ')', 'Bundle']
+
+
+def old_collapse(s: str) -> str:
+    s = s.replace('\t', ' ').replace('\xa0', ' ')
+    while '  ' in s:
+        s = s.replace('  ', ' ')
+    return s.replace('\n', '')
+
+
+def old_clean_sell_price(price: str) -> str:
+    return re.sub(r'data-sort-value="[a-zA-Z0-9-_ ]+"', "", price)
+
+
+def old_absolute_url(href: str) -> str:
+    return urllib.parse.urljoin("https://stardewvalleywiki.com", href)
+
+
+def old_links(content: str) -> bool:
+    return bool(re.findall(r'\[\[(.+?)\]\]', content)) and not re.findall(r'\[\[.+\]\]\(.+\)', content)
+
+
+def new_links(content: str) -> bool:
+    return bool(text.LINK_RE.findall(content)) and not text.BAD_LINK_RE.search(content)
+
+
+def cells(count: int, rng: random.Random, gaps: List[str]) -> List[str]:
+    """Infobox cell text, the words separated by a random pick of ``gaps``."""
+    return [''.join(rng.choice(WORDS) + rng.choice(gaps) for _ in range(rng.randint(3, 30))) for _ in range(count)]
+
+
+def each(func: Callable[[str], object], inputs: List[str]) -> Callable[[], None]:
+    def run() -> None:
+        for item in inputs:
+            func(item)
+    return run
+
+
+def main(argv=None) -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument('--repeat', type=int, default=20)
+    options = args.parse_args(argv)
+
+    rng = random.Random(20)
+    # what the saved pages have, no two whitespace characters in a row
+    single = cells(1000, rng, [' ', '\xa0', '\n'])
+    texts = cells(1000, rng, [' ', '  ', '\t', '\xa0', ' \n', '    '])
+    # a cell padded out with long runs, the replace loop went quadratic on these
+    padded = ['a' + ' ' * rng.randint(100, 2000) + 'b' for _ in range(100)]
+    prices = [f'<span data-sort-value="{rng.randint(1, 5000)}">{rng.randint(1, 5000)}g</span>' for _ in range(1000)]
+    hrefs = [f'/{rng.choice(WORDS[:5])}' for _ in range(1000)]
+    messages = [f'how do I grow [[{rng.choice(WORDS)}]] and [[{rng.choice(WORDS)}]]?' for _ in range(1000)]
+
+    cases: Dict[str, tuple] = {
+        'single spaced cells': (old_collapse, text.collapse_whitespace, single),
+        'cells with runs': (old_collapse, text.collapse_whitespace, texts),
+        'long whitespace runs': (old_collapse, text.collapse_whitespace, padded),
+        'clean_sell_price': (old_clean_sell_price, text.clean_sell_price, prices),
+        'absolute_url': (old_absolute_url, text.absolute_url, hrefs),
+        '[[link]] messages': (old_links, new_links, messages),
+    }
+    print(f'python {sys.version.split()[0]}, milliseconds per batch (median of {options.repeat})')
+    print(f"{'case':<22}{'items':>7}{'old':>9}{'new':>9}{'same':>7}")
+    for name, (old, new, inputs) in cases.items():
+        same = all(old(item) == new(item) for item in inputs)
+        old_time = timed(each(old, inputs), options.repeat)
+        new_time = timed(each(new, inputs), options.repeat)
+        print(f'{name:<22}{len(inputs):>7}{old_time:>9.2f}{new_time:>9.2f}{str(same):>7}')
+
+
+if __name__ == '__main__':
+    main()
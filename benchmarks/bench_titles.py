@@ -0,0 +1,167 @@
+"""Times the wiki title index against the scans over the title list it replaced.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_titles [--titles PATH] [--count N] [--queries N] [--remote URL]
+
+``--titles`` reads a title list saved by the bot (``allpages.json``), otherwise ``--count``
+synthetic titles are made up from wiki-like words. Misspelt queries are matched locally,
+and with ``--remote`` also through the wiki's own search the way ``/wiki`` used to, for the
+hit rate and latency of both.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from typing import Callable, List, Optional, Tuple
+
+import aiohttp
+
+from src.config import ALLPAGES_PATH
+from src.titles import TitleIndex, load_titles
+
+WORDS = [
+    'Prismatic', 'Shard', 'Shane', 'Abigail', 'Parsnip', 'Seeds', 'Ancient', 'Fruit', 'Frozen', 'Tear', 'Fire', 'Quartz',
+    'Earth', 'Crystal', 'Iridium', 'Bar', 'Ore', 'Sprinkler', 'Golden', 'Pumpkin', 'Void', 'Essence', 'Solar', 'Mayonnaise',
+    'Duck', 'Egg', 'Large', 'Milk', 'Goat', 'Cheese', 'Truffle', 'Oil', 'Wild', 'Honey', 'Community', 'Center', 'Bundle',
+    "Pierre's", 'General', 'Store', 'Joja', 'Mart', 'Cindersap', 'Forest', 'Calico', 'Desert', 'Skull', 'Cavern', 'Mines',
+    'Fish', 'Pond', 'Catfish', 'Sturgeon', 'Legend', 'Crimsonfish', 'Winter', 'Spring', 'Summer', 'Fall', 'Festival',
+    'Hat', 'Ring', 'Boots', 'Sword', 'Statue', 'Totem', 'Warp', 'Farm', 'Cave', 'Greenhouse', 'Quest', 'Star', 'Drop',
+]
+
+
+def synthetic_titles(count: int, rng: random.Random) -> List[str]:
+    titles = dict.fromkeys(WORDS)
+    while len(titles) < count:
+        titles[' '.join(rng.sample(WORDS, rng.randint(2, 3)))] = None
+    return list(titles)
+
+
+def per_query(func: Callable[[str], object], queries: List[str]) -> float:
+    """Median microseconds ``func`` takes on one of ``queries``."""
+    times = []
+    for query in queries:
+        start = time.perf_counter()
+        func(query)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e6
+
+
+def scan_resolve(titles: List[str], query: str) -> Optional[str]:
+    # the loop /wiki ran over the title list before the index
+    if query in titles:
+        return query
+    for title in titles:
+        if title.lower().strip() == query.lower().strip():
+            return title
+    return None
+
+
+def scan_complete(titles: List[str], current: str, limit: int = 25) -> List[str]:
+    # a case insensitive substring scan, what autocomplete did before the index
+    current = current.lower()
+    return [title for title in titles if current in title.lower()][:limit]
+
+
+def bench_index(titles: List[str], queries: int, rng: random.Random) -> TitleIndex:
+    start = time.perf_counter()
+    index = TitleIndex(titles)
+    print(f'{len(titles)} titles, index built in {(time.perf_counter() - start) * 1000:.1f} ms\n')
+
+    exact = [rng.choice(titles).upper() for _ in range(queries)]
+    prefixes = [title[:rng.randint(1, min(6, len(title)))] for title in rng.choices(titles, k=queries)]
+    print('microseconds per query (median)')
+    print(f"{'lookup':<22}{'scan':>10}{'index':>10}{'same':>7}")
+    same = all(scan_resolve(titles, query) == index.resolve(query) for query in exact)
+    print(f"{'exact, other case':<22}{per_query(lambda q: scan_resolve(titles, q), exact):>10.1f}{per_query(index.resolve, exact):>10.1f}{str(same):>7}")
+    # the index ranks differently to the scan, so only the speed is compared
+    print(f"{'autocomplete prefix':<22}{per_query(lambda q: scan_complete(titles, q), prefixes):>10.1f}{per_query(index.complete, prefixes):>10.1f}")
+    return index
+
+
+def typo(title: str, rng: random.Random) -> str:
+    """``title`` with one character dropped, added, changed or swapped with the next."""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    n = rng.randrange(len(title) - 1)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return title[:n] + title[n + 1:]
+    if kind == 1:
+        return title[:n] + rng.choice(letters) + title[n:]
+    if kind == 2:
+        return title[:n] + rng.choice(letters.replace(title[n].lower(), '')) + title[n + 1:]
+    return title[:n] + title[n + 1] + title[n] + title[n + 2:]
+
+
+def typos(titles: List[str], count: int, rng: random.Random) -> List[Tuple[str, str]]:
+    """``(typo, meant)`` pairs, the typos long enough for :meth:`TitleIndex.closest` to try and not themselves titles."""
+    index = TitleIndex(titles)
+    pairs = []
+    while len(pairs) < count:
+        title = rng.choice(titles)
+        if len(title) < 5:
+            continue
+        query = typo(title, rng)
+        if query.strip() and query not in index:
+            pairs.append((query, title))
+    return pairs
+
+
+def bench_local(index: TitleIndex, pairs: List[Tuple[str, str]]) -> None:
+    # what /wiki does before asking the wiki
+    resolve = lambda query: index.resolve(query) or index.closest(query)
+    hits = sum(resolve(query) == meant for query, meant in pairs)
+    wrong = sum(resolve(query) not in (None, meant) for query, meant in pairs)
+    elapsed = per_query(resolve, [query for query, _ in pairs])
+    print(f"{'local index':<22}{hits / len(pairs):>8.1%}{wrong / len(pairs):>8.1%}{elapsed / 1000:>10.2f}")
+    completed = per_query(index.complete, [query[:max(3, len(query) // 2)] for query, _ in pairs])
+    print(f"{'autocomplete, typo':<22}{'':>16}{completed / 1000:>10.2f}")
+
+
+async def bench_remote(url: str, pairs: List[Tuple[str, str]]) -> None:
+    # an unknown title costs a failed parse and then a search before the page is known
+    api = f"{url.rstrip('/')}/mediawiki/api.php"
+    found: List[Optional[str]] = []
+    times = []
+    async with aiohttp.ClientSession() as session:
+        for query, _ in pairs:
+            start = time.perf_counter()
+            async with session.get(api, params={'action': 'parse', 'page': query, 'prop': 'revid', 'format': 'json'}) as r:
+                await r.json()
+            params = {'action': 'query', 'list': 'search', 'srsearch': query, 'srnamespace': 0, 'srlimit': 1, 'format': 'json'}
+            async with session.get(api, params=params) as r:
+                results = (await r.json())['query']['search']
+            times.append(time.perf_counter() - start)
+            found.append(results[0]['title'] if results else None)
+    hits = sum(title == meant for title, (_, meant) in zip(found, pairs))
+    wrong = sum(title not in (None, meant) for title, (_, meant) in zip(found, pairs))
+    print(f"{'wiki search':<22}{hits / len(pairs):>8.1%}{wrong / len(pairs):>8.1%}{statistics.median(times) * 1000:>10.2f}")
+
+
+def main(argv=None) -> None:
+    args = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    args.add_argument('--titles', metavar='PATH', help=f'a saved title list, such as {ALLPAGES_PATH}')
+    args.add_argument('--count', type=int, default=5000, help='synthetic titles to make when there is no --titles')
+    args.add_argument('--queries', type=int, default=2000)
+    args.add_argument('--typos', type=int, default=1000)
+    args.add_argument('--remote', metavar='URL', help='a wiki to run the same typos through its search, such as https://stardewvalleywiki.com')
+    options = args.parse_args(argv)
+
+    rng = random.Random(7)
+    titles = load_titles(options.titles)[0] if options.titles else synthetic_titles(options.count, rng)
+    print(f'python {sys.version.split()[0]}')
+    index = bench_index(titles, options.queries, rng)
+
+    pairs = typos(titles, options.typos if not options.remote else min(options.typos, 200), rng)
+    print(f'\n{len(pairs)} single edit typos, milliseconds per query (median)')
+    print(f"{'matched by':<22}{'hits':>8}{'wrong':>8}{'ms':>10}")
+    bench_local(index, pairs)
+    if options.remote:
+        # kept small, every query is two requests to a real wiki
+        asyncio.run(bench_remote(options.remote, pairs))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,94 +1,130 @@
 
 
+import asyncio
 import datetime
+import json
 import logging
-import re
 import time
-from typing import Optional
+from typing import List, Mapping, Optional, Tuple
 import urllib.parse
 
 import aiohttp
-from bs4 import BeautifulSoup
-import bs4
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 
 from src.cache import Cache
-from src.config import CLEAR_CACHE_HOURS, OLD_WIKI_REDIRECT, WIKITEXT_LINKING
+from src.config import (
+    ALLPAGES_CRAWL_CONCURRENCY,
+    ALLPAGES_FULL_CRAWL_DAYS,
+    ALLPAGES_PATH,
+    OLD_WIKI_REDIRECT,
+    WIKI_API_URL,
+    WIKI_BACKEND,
+    WIKI_URL,
+    WIKITEXT_LINKING,
+)
 from src.embed import EmbedBuilder
-from src.emotes import getQualityFromPath, identify
+from src.parser import ParserPool, make_soup
+from src.text import BAD_LINK_RE, LINK_RE, OLD_WIKI_LINK_RE, link_target, split_message
+from src.titles import TitleIndex, load_titles, save_titles
 from utils import (
     BotU,
     CogU,
     ContextU,
     Cooldown,
     GUILDS,
-    generic_autocomplete,
     logger,
     logger_computer,
-    dchyperlink,
     CustomBaseView
 )
 
-allpages = []
+# where each range of a full title crawl starts, crawled concurrently
+CRAWL_RANGES = ['', 'D', 'H', 'M', 'R', 'W']
+
+title_index = TitleIndex()
 
 async def wiki_autocomplete(interaction: discord.Interaction, current: str):
-    global allpages
-
-    return await generic_autocomplete(current, allpages, interaction=interaction)
-
-def get_hyperlink_or_text(detail_tag: bs4.element.Tag) -> str:
-    atags = detail_tag.find_all("a")
-    s = ""
-    if atags:
-        tag = None
-        for tag in atags:
-
-            href = tag["href"]
-            # get absolute url
-            href = urllib.parse.urljoin("https://stardewvalleywiki.com", href)
-
-            s += f"{dchyperlink(href, tag.text).strip()}{tag.text.replace(tag.text, '').rstrip()}"
-            # check tag to ensure there is no text next to it after the hyperlink
-            if tag.next_sibling:
-                s += f"{tag.next_sibling}"
-            
-        # use regex to check for unclosed parenthases, then close them if they are open
-        if s.count('(') > s.count(')'):
-            s = s.rstrip()
-            s += ')'
-        elif s.count('(') < s.count(')'):
-            s = '(' + s
-    else:
-        s = detail_tag.text
-    s = s.replace('\t',' ').replace('\xa0',' ')
-    while '  ' in s:
-        s = s.replace('  ',' ')
-    return s.replace('\n','').strip()
-
-link_regex = r'\[\[(.+)\]\]'
-bad_link_regex = r'\[\[.+\]\]\(.+\)'
+    return [app_commands.Choice(name=title, value=title) for title in title_index.complete(current)]
+
+
+def page_url(title: str) -> str:
+    return f"{WIKI_URL}/{urllib.parse.quote(title.replace(' ', '_'))}"
+
+
+def page_title(url: str) -> str:
+    return urllib.parse.unquote(urllib.parse.urlsplit(url).path.lstrip('/')).replace('_', ' ')
+
+
+def not_found(title: str) -> EmbedBuilder:
+    """The embed sent when the wiki has no page for ``title``, linking to a search for it instead."""
+    return EmbedBuilder(
+        title='No page found - Stardew Valley Wiki',
+        url=f"{WIKI_URL}/mediawiki/index.php?search={urllib.parse.quote_plus(title)}",
+        description=f"The wiki has no page called **{discord.utils.escape_markdown(title)}**. Check the spelling, or search the wiki for it.",
+        color=discord.Color.orange(),
+    )
+
+
+def lead_section_params(title: str) -> dict:
+    # only the lead section, which holds the infobox and the first paragraphs
+    return {
+        'action': 'parse',
+        'page': title,
+        'redirects': 1,
+        'section': 0,
+        'prop': 'text|revid',
+        'disablelimitreport': 1,
+        'disableeditsection': 1,
+    }
+
+
+class WikiLookup:
+    """Bookkeeping for a single wiki lookup, so we can see how many upstream requests it took."""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.requests = 0
+
 
 class CommandsCog(CogU, name='Farm Computer'):
     """
     Main commands for Farm Computer. This includes the wiki command.
     """
-    prevs: list = []
     cache: Cache
+    titles: List[str]
+    titles_timestamp: Optional[str] = None
+    lookups: int = 0
+    upstream_requests: int = 0
+    background_requests: int = 0
 
     def __init__(self, bot: BotU):
         self.bot = bot
 
         self.cache = Cache(logger_computer, bot)
+        self.parser = ParserPool()
 
         self.infloop.start()
 
         self.session = aiohttp.ClientSession()
 
         self.logger_ = logger_computer
-        #self.cache.set_ttl(60 * 60 * 24)
-        #self.cache.set_max_size(1000)
+
+        self.titles = []
+        self._titles_lock = asyncio.Lock()
+
+    async def cog_load(self):
+        global title_index
+        # the saved title list is good enough for autocomplete until on_ready refreshes it
+        self.titles, self.titles_timestamp = await asyncio.to_thread(load_titles, ALLPAGES_PATH)
+        title_index = TitleIndex(self.titles)
+        await self.cache.load()
+
+    async def cog_unload(self):
+        self.infloop.cancel()
+        self.cache.close()
+        self.parser.close()
+        await self.session.close()
 
 
     @commands.hybrid_command(name="wiki", description = "Search the Stardew Valley Wiki for a specific page.")#guild=MAIN_SERVER)
@@ -122,12 +158,8 @@ class CommandsCog(CogU, name='Farm Computer'):
                 if not ctx.bot_permissions.embed_links:
                     return await ctx.reply("I need the embed links permission to use this command here.")
 
-        proper_query = query
-        if proper_query not in allpages:
-            for x in allpages:
-                if x.lower().strip() == query.lower().strip():
-                    proper_query = x
-                    break
+        # typos are resolved locally where we can, so they don't need the search page round trips
+        proper_query = title_index.resolve(query) or title_index.closest(query) or query
         
         proper_query = urllib.parse.quote(proper_query.replace(" ","_"))
 
@@ -142,59 +174,208 @@ class CommandsCog(CogU, name='Farm Computer'):
         end = time.time()
         logger_computer.info(f"Looked up {str(emb.title)[:str(emb.title).find('-')-1]} for {ctx.author} in {end-start} seconds.")
 
-    async def getallpages(self, sites: list=[], prev=None, first_iteration: bool=True):
-        print('running')
-        r = None
-        if prev in self.prevs: return None
-        
-        if first_iteration:
-            r = await self.session.get('https://stardewvalleywiki.com/Special:AllPages?from=&to=z&namespace=0&hideredirects=1')
-        else:
-            r = await self.session.get(prev)
-        
-        print('responded')
-
-        r = await r.text()
-
-        if prev:
-            print("more data after this")
-        elif first_iteration:
-            print("first iteration")
-        else:
-            print("reached last page")
-
-        b = BeautifulSoup(r, 'html.parser')
+    async def api(self, params: dict, lookup: Optional[WikiLookup] = None) -> dict:
+        """Calls the wiki's MediaWiki API, returning the decoded json."""
+        query = urllib.parse.urlencode({**params, 'format': 'json', 'formatversion': 2})
+        _, body = await self.fetch(f"{WIKI_API_URL}?{query}", lookup)
+        return json.loads(body)
+
+    async def _crawl_range(self, start: str, end: Optional[str], semaphore: asyncio.Semaphore) -> List[str]:
+        params = {'action': 'query', 'list': 'allpages', 'apnamespace': 0, 'apfilterredir': 'nonredirects', 'aplimit': 'max'}
+        if start:
+            params['apfrom'] = start
+        if end:
+            params['apto'] = end
+
+        titles = []
+        async with semaphore:
+            while True:
+                data = await self.api(params)
+                # apto is inclusive, the next range picks that title up
+                titles.extend(page['title'] for page in data['query']['allpages'] if page['title'] != end)
+                if 'continue' not in data:
+                    return titles
+                params.update(data['continue'])
+
+    async def crawl_allpages(self) -> List[str]:
+        """Lists every article title on the wiki, crawling a few ranges of the alphabet at once."""
+        semaphore = asyncio.Semaphore(ALLPAGES_CRAWL_CONCURRENCY)
+        bounds = [*CRAWL_RANGES, None]
+        chunks = await asyncio.gather(
+            *(self._crawl_range(bounds[i], bounds[i + 1], semaphore) for i in range(len(CRAWL_RANGES)))  # type: ignore
+        )
+        return [title for chunk in chunks for title in chunk]
+
+    async def recent_title_changes(self, titles: List[str], since: str) -> List[str]:
+        """Applies the article creations, deletions and moves since ``since`` to ``titles``."""
+        params = {
+            'action': 'query',
+            'list': 'recentchanges',
+            'rcnamespace': 0,
+            'rctype': 'new|log',
+            'rcprop': 'title|loginfo|redirect',
+            'rcdir': 'newer',
+            'rcstart': since,
+            'rclimit': 'max',
+        }
+        # dict keeps the order and makes removals cheap
+        current = dict.fromkeys(titles)
+        while True:
+            data = await self.api(params)
+            for change in data['query']['recentchanges']:
+                title = change['title']
+                if change['type'] == 'new':
+                    if not change.get('redirect'):
+                        current[title] = None
+                elif change.get('logtype') == 'delete':
+                    if change.get('logaction') == 'restore':
+                        current[title] = None
+                    elif change.get('logaction') in ('delete', 'delete_redir'):
+                        current.pop(title, None)
+                    # revision and log entry deletions hide an edit or a log line, the page stays
+                elif change.get('logtype') == 'move':
+                    current.pop(title, None)
+                    target = change.get('logparams', {})
+                    if target.get('target_ns') == 0 and target.get('target_title'):
+                        current[target['target_title']] = None
+            if 'continue' not in data:
+                return sorted(current)
+            params.update(data['continue'])
+
+    async def getallpages(self) -> List[str]:
+        """Returns every article title on the wiki.
+
+        The list is saved to disk, and brought up to date from the wiki's recent changes
+        unless it is more than ``ALLPAGES_FULL_CRAWL_DAYS`` old, in which case it is crawled again.
+        """
+        if self.titles_timestamp is None:
+            self.titles, self.titles_timestamp = await asyncio.to_thread(load_titles, ALLPAGES_PATH)
 
+        now = datetime.datetime.now(datetime.timezone.utc)
+        timestamp = now.strftime('%Y-%m-%dT%H:%M:%SZ')
 
-        for found in b.find("ul", {"class": "mw-allpages-chunk"}).find_all("li"):
-            sites.append(found.find("a").get("href"))
+        last = None
+        if self.titles and self.titles_timestamp:
+            last = datetime.datetime.strptime(self.titles_timestamp, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=datetime.timezone.utc)
 
-        for next in b.find_all('a',{"title": "Special:AllPages"}):
-            if "Next page" in next.text:    
-                r = await self.getallpages(sites, "https://stardewvalleywiki.com"+next.get("href"), first_iteration=False)  
-                self.prevs.append("https://stardewvalleywiki.com"+next.get("href"))  
-        returnv = []
-        for site in sites:
-            returnv.append(str(site.replace("%27","'").replace("%20"," ").replace('_'," "))[1:])
-        return returnv
+        if last is not None and now - last < datetime.timedelta(days=ALLPAGES_FULL_CRAWL_DAYS):
+            titles = await self.recent_title_changes(self.titles, self.titles_timestamp) # type: ignore
+            logger_computer.info(f"Updated title list from recent changes ({len(titles) - len(self.titles):+} titles)")
+        else:
+            titles = await self.crawl_allpages()
+            logger_computer.info(f"Crawled {len(titles)} titles")
+
+        self.titles, self.titles_timestamp = titles, timestamp
+        await asyncio.to_thread(save_titles, ALLPAGES_PATH, titles, timestamp)
+        return titles
+
+    async def refresh_titles(self) -> None:
+        global title_index
+        async with self._titles_lock:
+            try:
+                titles = await self.getallpages()
+            except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+                logger_computer.error(f"Failed to refresh the title list, keeping the old one: {e}")
+                return
+            # built off to the side and swapped in at once, so lookups never see a half built index
+            title_index = TitleIndex(titles)
+            # pages created since they were looked up shouldn't stay missing until they expire
+            if forgotten := self.cache.forget_missing(title_index):
+                logger_computer.info(f"{forgotten} titles remembered as missing now exist")
 
     @commands.Cog.listener()
     async def on_ready(self):
-        global allpages
-        allpages = await self.getallpages()
-        self.prevs.clear()
+        await self.refresh_titles()
 
     @tasks.loop(time=[datetime.time(hour=x, minute=0) for x in range(24)])
     async def infloop(self):
-        global allpages
-        allpages = await self.getallpages()
-        self.prevs.clear()
-        if CLEAR_CACHE_HOURS <= 0:
-            CLEAR_CACHE_HOURS = 5
-        else:
-            CLEAR_CACHE_HOURS -= 1
-        logger.info(f"Clearing cache in {CLEAR_CACHE_HOURS} hours")
+        await self.refresh_titles()
+
+
+    async def resolve_links(self, links: List[str]) -> List[str]:
+        """Resolves ``[[links]]`` to the titles of the pages they point at, dropping ones that don't exist.
+
+        Titles in the local index are resolved without a request, the rest are checked
+        together in as few api calls as possible.
+        """
+        # [[Parsnip|the root]] and [[Parsnip#Seeds]] both point at Parsnip, and a | would split the titles= list
+        links = list(dict.fromkeys(target for link in links if (target := link_target(link))))
+        resolved = {link: title_index.resolve(link) for link in links}
+        unknown = [link for link, title in resolved.items() if title is None and not self.cache.is_missing(link)]
+
+        # the api takes up to 50 titles per query
+        for i in range(0, len(unknown), 50):
+            chunk = unknown[i:i + 50]
+            try:
+                data = await self.api({'action': 'query', 'titles': '|'.join(chunk), 'redirects': 1})
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.error(f'Failed to resolve wiki links {chunk}: {e}')
+                continue
+
+            query = data.get('query', {})
+            # map each link through normalisation and redirects to the title it ends up at
+            renames = {entry['from']: entry['to'] for entry in query.get('normalized', []) + query.get('redirects', [])}
+            existing = {page['title'] for page in query.get('pages', []) if 'missing' not in page and 'invalid' not in page}
+            for link in chunk:
+                title = link
+                for _ in range(3):
+                    if title not in renames:
+                        break
+                    title = renames[title]
+                if title in existing:
+                    resolved[link] = title
+                else:
+                    self.cache.mark_missing(link)
+
+        return [title for title in dict.fromkeys(resolved.values()) if title is not None]
 
+    async def fetch(
+        self, url: str, lookup: Optional[WikiLookup] = None, headers: Optional[dict] = None
+    ) -> Tuple[aiohttp.ClientResponse, str]:
+        """Makes a single upstream request, returning the response along with its body."""
+        async with self.session.get(url, headers=headers) as r:
+            body = await r.text()
+
+        if lookup:
+            lookup.requests += 1
+            self.upstream_requests += 1
+        else:
+            # title crawls, link resolution and background refreshes, kept out of the per lookup numbers
+            self.background_requests += 1
+        return r, body
+
+    async def fetch_page(
+        self,
+        url: str,
+        lookup: Optional[WikiLookup] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> Tuple[int, Optional[str], Optional[str], Mapping[str, str]]:
+        """Fetches a page for the parser, conditionally if validators are given.
+
+        Returns the status, the html, the page title if the html doesn't carry it and the
+        validators to revalidate it with later.
+        """
+        if WIKI_BACKEND == 'api':
+            title = page_title(url)
+            if etag and etag.startswith('rev:'):
+                data = await self.api({'action': 'query', 'prop': 'revisions', 'rvprop': 'ids', 'titles': title, 'redirects': 1}, lookup)
+                pages = data['query']['pages']
+                if pages and pages[0].get('revisions') and f"rev:{pages[0]['revisions'][0]['revid']}" == etag:
+                    return 304, None, None, {}
+
+            data = await self.api(lead_section_params(title), lookup)
+            if 'error' in data:
+                return 404, None, None, {}
+            return 200, data['parse']['text'], data['parse']['title'], {'ETag': f"rev:{data['parse']['revid']}"}
+
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        r, html = await self.fetch(url, lookup, headers=headers)
+        return r.status, html, None, r.headers
 
     async def search(
         self, query: str, _logger: Optional[logging.Logger] = None, cache=None
@@ -212,288 +393,114 @@ class CommandsCog(CogU, name='Farm Computer'):
         encoded = query.replace(" ", "+")
         #encoded = urllib.parse.quote(query)
 
-        r = None
-        status = None
-        full_href = None
+        lookup = WikiLookup(query)
+        self.lookups += 1
 
-        try:
-            url = f"https://stardewvalleywiki.com/{query}"
-            r = await self.session.get(url)
-            if r.status > 350:
-                # print(r.status)
-                raise Exception()
-            status = r.status
-            full_href = str(r._real_url)
-            soup = bs4.BeautifulSoup(await r.text(), "html.parser")
-        except Exception:
-            # print(r.status)
-            url = f"https://stardewvalleywiki.com/mediawiki/index.php?search={encoded}"
-
-            res = await self.session.get(url)
-
-            soup = bs4.BeautifulSoup(await res.text(), "html.parser")
-
-            # logger.info(f'Got status code: {res.status_code}')
-            # logger.info(f'Got url: {res.url}')
-
-            redir = False
-            if res.status in [301, 302, 304]:
-                try:
-                    redir = soup.find_all("meta", {"property": "og:url"})[0]["content"]
-                except Exception:
-                    pass
-
-            if redir:
-                # return parse(redir)
-                return await cache.get(redir)
-
-            for li in soup.find_all("li", {"class": "mw-search-result"}):
-                href = li.find_all("a")[0]["href"]
-                full_href = f"https://stardewvalleywiki.com{href}"
-
-            if full_href != url and full_href != urllib.parse.urlparse(url).path:
-                r = await self.session.get(full_href)
-                status = r.status
-
-        if status == 200:
-            # return parse(full_href)
-            return await cache.get(full_href)
-        elif status in [301, 302, 304]:
-            redirected_link = r.url
-            # return parse(redirected_link)
-            return await cache.get(redirected_link)
-
-        # return parse(res.url)
-        if soup.find("p", {"class": "mw-search-createlink"}):
-            return help().build()
-        resp = await cache.get(str(res.url))
-
-        logger.info(f"Got response for {query} in {time.time() - start_time} seconds")
+        resp = await cache.coalesce(
+            f"{WIKI_URL}/{query}",
+            lambda: self._resolve(query, encoded, cache, lookup),
+        )
+
+        logger.info(f"Got response for {query} in {time.time() - start_time} seconds ({lookup.requests} upstream requests, {self.upstream_requests / self.lookups:.2f} per lookup overall, {self.background_requests} outside of lookups)")
         return resp
 
+    async def _resolve(self, query: str, encoded: str, cache: Cache, lookup: WikiLookup) -> discord.Embed:
+        # every page is downloaded at most once per lookup; whatever body we end up
+        # with is handed straight to the parser instead of being fetched again
+        url = f"{WIKI_URL}/{query}"
+
+        if (emb := cache.lookup(url)) is not None:
+            return emb
+        if (emb := cache.serve_stale(url)) is not None:
+            return emb
+        if (emb := await cache.revalidate(url, lookup)) is not None:
+            return emb
 
-    async def parse(self, url: str, build: bool=True) -> discord.Embed:
-        embed = EmbedBuilder(fields=[], color=discord.Color.orange())
+        # query is quoted for the url by now, the missing titles are kept as the wiki spells them
+        title = page_title(url)
+        if cache.is_missing(title):
+            logger.info(f'{title} is known not to exist, skipping the wiki')
+            return not_found(title).build()
 
+        if WIKI_BACKEND == 'api':
+            return await self._resolve_api(query, url, cache, lookup)
+
+        r, html = await self.fetch(url, lookup)
+        if r.status <= 350:
+            return await cache.get(str(r.url), html=html, aliases=(url,), headers=r.headers)
+
+        search_url = f"{WIKI_URL}/mediawiki/index.php?search={encoded}"
+        res, html = await self.fetch(search_url, lookup)
+
+        if "index.php?search=" not in str(res.url):
+            # the search redirected us straight to the article, so we already have it
+            return await cache.get(str(res.url), html=html, aliases=(url,), headers=res.headers)
+
+        soup = make_soup(html)
+
+        full_href = None
+        for li in soup.find_all("li", {"class": "mw-search-result"}):
+            href = li.find_all("a")[0]["href"]
+            full_href = f"{WIKI_URL}{href}"
+
+        if not full_href:
+            # nothing matched, mediawiki is just offering to create the page
+            cache.mark_missing(title)
+            return not_found(title).build()
+
+        # the lookup was counted against the query already
+        if (emb := cache.lookup(full_href, count=False)) is not None:
+            return emb
+        if (emb := cache.serve_stale(full_href)) is not None:
+            return emb
+        if (emb := await cache.revalidate(full_href, lookup)) is not None:
+            return emb
+
+        r, html = await self.fetch(full_href, lookup)
+        return await cache.get(str(r.url), html=html, aliases=(url, full_href), headers=r.headers)
+
+    async def _resolve_api(self, query: str, url: str, cache: Cache, lookup: WikiLookup) -> discord.Embed:
+        # action=parse follows redirects itself, so an existing page is a single request
+        title = page_title(url)
+        data = await self.api(lead_section_params(title), lookup)
+
+        if 'error' in data:
+            results = await self.api({'action': 'query', 'list': 'search', 'srsearch': title, 'srnamespace': 0, 'srlimit': 1}, lookup)
+            if not results['query']['search']:
+                cache.mark_missing(title)
+                return not_found(title).build()
+
+            title = results['query']['search'][0]['title']
+            if (emb := cache.lookup(page_url(title), count=False)) is not None:
+                return emb
+            if (emb := cache.serve_stale(page_url(title))) is not None:
+                return emb
+
+            data = await self.api(lead_section_params(title), lookup)
+            if 'error' in data:
+                return not_found(title).build()
+
+        parsed = data['parse']
+        full_href = page_url(parsed['title'])
+        emb = await self.parse(full_href, False, html=parsed['text'], title=parsed['title'])
+        return await cache.put(full_href, emb, aliases=(url,), headers={'ETag': f"rev:{parsed['revid']}"})
+
+    async def parse(self, url: str, build: bool=True, html: Optional[str] = None, title: Optional[str] = None) -> discord.Embed:
         logger.info(f"Parsing url: {url}")
 
         if (
-            "https://stardewvalleywiki.com/Special:Search" in url
-            or "https://stardewvalleywiki.com/mediawiki/index.php?search=" in url
+            f"{WIKI_URL}/Special:Search" in url
+            or f"{WIKI_URL}/mediawiki/index.php?search=" in url
             or not url
         ):
-
-            return help().build() if build else help()
-
-        html = await (await self.session.get(url)).text()
-        soup = bs4.BeautifulSoup(html, "html.parser")
-
-        # find the first <img> that does NOT have a srcset attr
-
-        main_logo_url = "https://stardewvalleywiki.com/mediawiki/images/6/68/Main_Logo.png"
-
-        try:
-
-            embed.thumbnail = (
-                "https://stardewvalleywiki.com"
-                + soup.find_all("img", {"srcset": False})[0]["src"]
-            )
-            if (
-                embed.thumbnail
-                == "https://stardewvalleywiki.com/mediawiki/resources/assets/licenses/cc-by-nc-sa.png"
-            ):
-                embed.image = main_logo_url
-                embed.thumbnail = None
-
-        except Exception:
-            embed.image = main_logo_url
-
-        pagename = soup.find_all("h1", {"id": "firstHeading"})[0].text
-        embed.title = pagename + " - Stardew Valley Wiki"
-        embed.url = url
-
-        # find all id=infoboxtable > tr that have a infoboxsection and infoboxdetail
-
-        infobox = soup.find_all("table", {"id": "infoboxtable"})
-
-        # logger.info(f'Found infoboxtable: {infobox}')
-
-        if infobox:
-            infobox = infobox[0]
-
-            trs = infobox.find_all("tr")
-
-            for tr in trs:
-                # logger.info(f'Found tr: {tr}')
-                # try:
-                if tr.find_all(
-                    "table", {"style": "width:101%;"}
-                ):  # or tr.find_all('div', {'class': 'parent'}):
-                    break
-                section = tr.find_all("td", {"id": "infoboxsection"})
-                detail = tr.find_all("td", {"id": "infoboxdetail"})
-
-                if section:
-                    section = section[0].text
-                    # logger.info(f'Found section: {section}')
-
-                if detail:
-                    detail = detail[0]
-
-                if not section or not detail:
-                    continue
-
-                if (table := detail.find_all("table")) and section.strip() != "Sell Price":
-                    table = table[0]
-                    rows = table.find_all("tr")
-
-                    first_row = rows[0]
-
-                    text = ""
-                    for row in rows:
-                        do_newline = True
-                        if row.find_all("tr"):
-                            continue
-                        for i, td in enumerate(row.find_all("td")):
-                            # logger.info(f'Found td: {td}')
-
-                            if backimages := td.find_all("div", {"class": "backimage"}):
-
-                                # logger.info(f'Found backimage: {backimages}')
-                                emoji = identify(
-                                    backimages[0].find_all("img")[0]["src"],
-                                    pagename,
-                                    foreimages=td.find_all("div", {"class": "foreimage"}),
-                                )
-
-                                # logger.info(f'Emoji: {emoji}')
-                                text += f"{emoji} "
-                            inner = td.text.strip()
-                            if not inner:
-                                continue
-                            elif (
-                                td.has_attr("style")
-                                and "vertical-align: bottom;" in td["style"]
-                            ):
-                                # logger.info(f'Found td with style: {td["style"]}')
-                                text += f"{inner} "
-                            elif not td.children or not td.attrs:
-                                # logger.info(f'Found td with no children/attrs')
-                                do_newline = False
-                                text += f"{inner} "
-                            # logger.info(f'Found inner: *{inner}*')
-
-                            # check if the next td has no attrs and no children
-                            if i + 1 < len(row.find_all("td")):
-                                next_td = row.find_all("td")[i + 1]
-                                if not next_td.attrs and not next_td.children:
-                                    do_newline = False
-                            elif row.parent != first_row.parent:
-                                do_newline = False
-
-                        # logger.info(f'Found row: {row}')
-
-                        if do_newline:
-                            text += "\n"
-
-                    detail = text
-
-                elif spans := detail.find_all("span", {"class": "no-wrap"}):
-                    detail = get_hyperlink_or_text(spans[0])
-                elif spans := detail.find_all("span", {"style": "display: none;"}):
-                    # logger.info(f'Found span: {spans}')
-                    #detail = detail.text.replace(spans[0].text, "")
-                    if spans[0].find_all("a"):
-                        href = spans[0].find_all("a")[0]["href"]
-                        # get absolute url
-                        href = urllib.parse.urljoin("https://stardewvalleywiki.com", href)
-
-                        detail = dchyperlink(href, detail.text.replace(spans[0].text, ""))
-                    else:
-                        detail = detail.text.replace(spans[0].text, "")
-
-                elif spans := detail.find_all("span", {"class": "nametemplate"}):
-                    items = []
-                    for span in spans:
-                        #items.append(span.text)
-                        text = get_hyperlink_or_text(span)
-                        items.append(text)
-
-                    detail = ", ".join(items)
-
-                elif p_tags := detail.find_all(
-                    "p", {"class": lambda x: x != "mw-empty-elt"}
-                ):
-                    items = []
-                    for p in p_tags:
-                        items.append(get_hyperlink_or_text(p))
-
-                    detail = ", ".join(items)
-                elif [
-                    x for x in detail.find_all("img") if x["alt"].endswith(" Quality.png")
-                ]:
-                    # getinnerhtml of the detail
-
-                    # replace all LOOSE TEXT in the detail with a <loose> tag
-                    for child in detail.children:
-                        if isinstance(child, bs4.element.NavigableString):
-                            # child.replace_with(f'<loose>{child}</loose>') will escape the <>
-                            # so we have to do this instead
-                            child.wrap(soup.new_tag("span"))
-
-                    # logger.info(f'Found child: {str(detail.children)}')
-                    # extract the img/span pairs
-                    # the html is like this:
-                    # text, img | text, img | text, img | text
-                    pairs = []
-                    skip = False
-                    for i, child in enumerate(detail.children):
-                        if skip:
-                            skip = False
-                            continue
-                        if isinstance(child, bs4.element.Tag):
-                            # check if its an img, if it is, get the next child, otherwise set the img inthe aay to none
-                            if child.name == "img":
-                                img = child.attrs["src"]
-                                text = detail.contents[i + 1].text
-
-                                # for some reason it has weird escaped unicode
-                                text = "".join(
-                                    [i if ord(i) < 128 else " " for i in text]
-                                ).strip()
-
-                                pairs.append((text, img))
-                                skip = True
-                            else:
-                                pairs.append((child.text, None))
-
-                    # logger.info(f'Found pairs: {str(pairs)}')
-
-                    detail = ""
-                    for pair in pairs:
-                        if pair[1]:
-                            detail += f"{getQualityFromPath(pair[1])} {pair[0]} "
-                        else:
-                            detail += f"{pair[0]}"
-
-                else:
-                    #detail = detail.text
-                    # maybe a hyperlink?
-                    detail = get_hyperlink_or_text(detail)
-
-                embed.fields.append({"name": section, "value": detail, "inline": False})
-                # except Exception as e:
-                #     logger.error(f'Error failed to parse tr: {e} on line {e.__traceback__.tb_lineno}')
-                #     # throw the error
-                #     # raise e
-                #     pass
-        else:
-            body = soup.find_all("div", {"class": "mw-parser-output"})[0]
-            #  get the first two <p> tags
-            for p in body.find_all("p")[:2]:
-                embed.description += cleanSellPrice(p.text) + "\n\n"
-        # logger.info(f'Got embed: {embed}')
-        # return embed.build()
+            search = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query).get('search')
+            emb = not_found(search[0] if search else page_title(url))
+            return emb.build() if build else emb
+
+        if html is None:
+            _, html, title, _ = await self.fetch_page(url)
+        payload = await self.parser.parse(url, html, title) # type: ignore
+        embed = EmbedBuilder.from_dict(payload)
         return embed.build() if build else embed
 
     @commands.Cog.listener()
@@ -504,26 +511,18 @@ class CommandsCog(CogU, name='Farm Computer'):
         content = str(message.content)
         
         if OLD_WIKI_REDIRECT:
-            for community_wiki_link in re.findall(r"https://stardewcommunitywiki\.com/[a-zA-Z0-9_/:\-%]*", content):
+            for community_wiki_link in OLD_WIKI_LINK_RE.findall(content):
                 link_path = urllib.parse.urlparse(community_wiki_link).path
-                new_url = urllib.parse.urljoin('https://stardewvalleywiki.com', link_path)
+                new_url = urllib.parse.urljoin(WIKI_URL, link_path)
                 await message.channel.send(f"I notice you're linking to the old wiki, that wiki has been in a read-only state for several months. Here are the links to that page on the new wiki: {new_url}")
         
         if WIKITEXT_LINKING:
-            links = re.findall(link_regex, content)
-            if links and not re.findall(bad_link_regex, content):
-                for link in links:
-                    r = await self.session.get(f'https://stardewvalleywiki.com/{link}')
-
-                    if r.status in [301, 302, 304, 400, 404]:
-                        return
-                    else:
-                        await message.reply(f'<https://stardewvalleywiki.com/{link}>', mention_author=False)
-
-def cleanSellPrice(price: str) -> str:
-    regex = r'data-sort-value="[a-zA-Z0-9-_ ]+"'
-    return re.sub(regex, "", price)
-
+            links = LINK_RE.findall(content)
+            if links and not BAD_LINK_RE.search(content):
+                titles = await self.resolve_links(links)
+                # one link per line, over as many replies as it takes to stay under the message limit
+                for reply in split_message([f'<{page_url(title)}>' for title in titles]):
+                    await message.reply(reply, mention_author=False)
 
 async def setup(bot: BotU):
     cog = CommandsCog(bot)
@@ -1,10 +1,12 @@
 from __future__ import annotations
 import datetime
+import json
 from typing import Dict, Optional, Tuple, Type, Union
 
 import discord
 import environ
-from tortoise import Tortoise, fields
+from tortoise import Tortoise, fields, timezone
+from tortoise.transactions import in_transaction
 from tortoise.models import Model
 from typing_extensions import Self
 
@@ -180,7 +182,8 @@ class Commands(Base):
     def user_id(self):
         return self.author_id
 
-    used = fields.DatetimeField()
+    # indexed for the last 24 hours stats, everything older is read from the rollups
+    used = fields.DatetimeField(index=True)
     #uses = fields.BigIntField(default=1)
     prefix = fields.CharField(max_length=23)
     command = fields.CharField(max_length=100)
@@ -193,8 +196,29 @@ class Commands(Base):
     kwargs = fields.JSONField(null=True)
     transaction_id = fields.UUIDField(null=True)
 
+    # the columns written by bulk_insert's COPY, in order
+    BULK_COLUMNS = (
+        'created_at', 'updated_at', 'guild_id', 'channel_id', 'author_id', 'used', 'prefix', 'command',
+        'command_id', 'failed', 'app_command', 'is_guild_install', 'is_user_install', 'args', 'kwargs', 'transaction_id',
+    )
+
+    @staticmethod
+    def _bulk_row(data: dict) -> dict:
+        # batch entries use guild/channel/author, the columns are *_id
+        row = dict(data)
+        for key in ('guild', 'channel', 'author'):
+            if key in row:
+                row[f'{key}_id'] = row.pop(key)
+        return row
+
     @classmethod
     async def bulk_insert(cls, bulk_data: list[dict]):
+        """Inserts a batch of command uses in one go.
+
+        On asyncpg the rows are streamed in with a single COPY, anywhere else
+        (sqlite, psycopg) they go through Tortoise's ``bulk_create``. The rollups are
+        upserted with the placeholders of whichever driver it is.
+        """
         # self._data_batch.append(
         #         {
         #             'guild': guild_id,
@@ -211,23 +235,162 @@ class Commands(Base):
         #     )
         if not bulk_data:
             return
-        
-        #models_list = []
-
-        for data in bulk_data:
-            if data.get("guild",None):
-                data["guild_id"] = data.pop("guild")
-            if data.get("channel",None):
-                data["channel_id"] = data.pop("channel")
-            if data.get("author",None):
-                data["author_id"] = data.pop("author")
-            #models_list.append(cls(**data))
-            #data['uses'] = await cls.filter(guild_id=data.get("guild_id"), command=data.get("command")).count() + 1
-            await cls.create(**data)
-        #await cls.bulk_create(models_list, batch_size=1000)
-        
+
+        rows = [cls._bulk_row(data) for data in bulk_data]
+        rollups = [(rollup, rollup.aggregate(rows)) for rollup in ROLLUPS]
+
+        conn = Tortoise.get_connection('default')
+        if conn.capabilities.dialect == 'postgres':
+            async with conn.acquire_connection() as raw:
+                if hasattr(raw, 'copy_records_to_table'):
+                    now = timezone.now()
+                    records = [
+                        (
+                            now, now, row.get('guild_id'), row.get('channel_id'), row['author_id'], row['used'],
+                            row['prefix'], row['command'], row.get('command_id'), row.get('failed', False),
+                            row.get('app_command', False), row.get('is_guild_install', True), row.get('is_user_install', False),
+                            # jsonb goes over the wire as text
+                            *(json.dumps(row[key]) if row.get(key) is not None else None for key in ('args', 'kwargs')),
+                            row.get('transaction_id'),
+                        )
+                        for row in rows
+                    ]
+                    # the rollups are updated with the rows, so a failed batch leaves neither behind
+                    async with raw.transaction():
+                        await raw.copy_records_to_table(cls._meta.db_table, records=records, columns=cls.BULK_COLUMNS)
+                        for rollup, totals in rollups:
+                            await raw.executemany(rollup.upsert_query('asyncpg'), totals)
+                    return
+
+        async with in_transaction() as tx:
+            await cls.bulk_create([cls(**row) for row in rows], batch_size=1000, using_db=tx)
+            for rollup, totals in rollups:
+                await tx.execute_many(rollup.upsert_query(client_driver(tx)), totals)
+
     class Meta:
         table = "Commands"
+        # a member's most used commands are counted from this index alone, no rollup is keyed that finely
+        indexes = (('guild_id', 'author_id', 'command'),)
+
+# the placeholders each driver takes, by the Tortoise backend package its client comes from
+PLACEHOLDERS = {'asyncpg': '${n}', 'psycopg': '%s', 'sqlite': '?'}
+
+def client_driver(conn) -> str:
+    """The driver behind a Tortoise client or transaction, such as asyncpg, psycopg or sqlite.
+
+    psycopg and asyncpg share the postgres dialect but not their placeholders.
+    """
+    return type(conn).__module__.split('.')[2]
+
+class Rollup(Base):
+    """Command uses counted per day, guild and a few more of the ``Commands`` columns.
+
+    Kept up to date by :meth:`Commands.bulk_insert`, so the all time stats are a sum over
+    these instead of a scan over every command ever used. Rebuilt from scratch by :meth:`backfill`.
+    """
+
+    day = fields.DateField()
+    """The UTC day the command was used on."""
+
+    guild_id = fields.BigIntField(default=0)
+    """0 for commands used outside a guild, NULLs would never conflict in the upsert."""
+
+    uses = fields.BigIntField(default=0)
+    first_used = fields.DatetimeField()
+
+    # the unique key, in the same order as Meta.unique_together
+    KEY_COLUMNS: Tuple[str, ...] = ()
+    # how backfill works out a key column from "Commands" where it isn't the column of the same name
+    BACKFILL_COLUMNS = {'day': "(used AT TIME ZONE 'UTC')::date", 'guild_id': 'COALESCE(guild_id, 0)'}
+
+    @classmethod
+    def row_key(cls, row: dict, day: datetime.date) -> tuple:
+        """The ``KEY_COLUMNS`` of the rollup a ``Commands`` row is counted into, ``day`` being the UTC day it was used on."""
+        key = []
+        for column in cls.KEY_COLUMNS:
+            value = day if column == 'day' else row.get(column)
+            # a NULL is counted under the column's default, like guild 0 for commands used in DMs
+            key.append(cls._meta.fields_map[column].default if value is None else value)
+        return tuple(key)
+
+    @classmethod
+    def aggregate(cls, rows: list[dict]) -> list[tuple]:
+        """Counts a batch of ``Commands`` rows into rollup rows for :meth:`upsert_query`."""
+        totals: Dict[tuple, list] = {}
+        for row in rows:
+            used = row['used']
+            if used.tzinfo is None:
+                used = used.replace(tzinfo=datetime.timezone.utc)
+            key = cls.row_key(row, used.astimezone(datetime.timezone.utc).date())
+            total = totals.get(key)
+            if total is None:
+                totals[key] = [1, used]
+            else:
+                total[0] += 1
+                total[1] = min(total[1], used)
+
+        now = timezone.now()
+        return [(now, now, *key, uses, first_used) for key, (uses, first_used) in totals.items()]
+
+    @classmethod
+    def upsert_query(cls, driver: str) -> str:
+        """The upsert that adds :meth:`aggregate`'s rows into the table, with the placeholders ``driver`` takes."""
+        columns = ('created_at', 'updated_at', *cls.KEY_COLUMNS, 'uses', 'first_used')
+        placeholders = ', '.join(PLACEHOLDERS[driver].format(n=n) for n in range(1, len(columns) + 1))
+        earliest = 'MIN' if driver == 'sqlite' else 'LEAST'
+        table = cls._meta.db_table
+        return (
+            f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({placeholders}) '
+            f'ON CONFLICT ({", ".join(cls.KEY_COLUMNS)}) DO UPDATE SET '
+            f'uses = "{table}".uses + EXCLUDED.uses, '
+            f'first_used = {earliest}("{table}".first_used, EXCLUDED.first_used), '
+            f'updated_at = EXCLUDED.updated_at'
+        )
+
+    @classmethod
+    async def backfill(cls) -> int:
+        """Rebuilds every rollup from the ``Commands`` table, returning how many there are."""
+        sources = ', '.join(cls.BACKFILL_COLUMNS.get(column, column) for column in cls.KEY_COLUMNS)
+        groups = ', '.join(str(n) for n in range(3, len(cls.KEY_COLUMNS) + 3))
+        async with in_transaction() as tx:
+            await tx.execute_script(f'DELETE FROM "{cls._meta.db_table}";')
+            await tx.execute_script(
+                f'''INSERT INTO "{cls._meta.db_table}" (created_at, updated_at, {", ".join(cls.KEY_COLUMNS)}, uses, first_used)
+                   SELECT CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, {sources}, COUNT(*), MIN(used)
+                   FROM "{Commands._meta.db_table}"
+                   GROUP BY {groups};'''
+            )
+        return await cls.all().count()
+
+    class Meta:
+        abstract = True
+
+class CommandRollups(Rollup):
+    """Command uses per day, guild, command and install type, for the top commands and the install breakdown."""
+
+    command = fields.CharField(max_length=100)
+    is_user_install = fields.BooleanField(default=False)
+
+    KEY_COLUMNS = ('guild_id', 'command', 'is_user_install', 'day')
+
+    class Meta:
+        table = "CommandRollups"
+        # led by guild_id, so the unique index also serves the per guild stats
+        unique_together = (('guild_id', 'command', 'is_user_install', 'day'),)
+
+class AuthorRollups(Rollup):
+    """Command uses per day, guild and author, the smaller of the two, for the totals, top guilds and top users."""
+
+    author_id = fields.BigIntField(index=True)
+
+    KEY_COLUMNS = ('guild_id', 'author_id', 'day')
+
+    class Meta:
+        table = "AuthorRollups"
+        unique_together = (('guild_id', 'author_id', 'day'),)
+
+# every rollup Commands.bulk_insert keeps up to date
+ROLLUPS: Tuple[Type[Rollup], ...] = (CommandRollups, AuthorRollups)
 
 class Blacklist(Base):
     """Table relating blacklisted users and/or guilds."""
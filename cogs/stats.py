@@ -25,6 +25,7 @@ import os
 import re
 import sys
 import textwrap
+import time
 import traceback
 from typing import Any, Dict, List, Optional, Tuple, TypedDict, Union
 
@@ -36,12 +37,15 @@ import pkg_resources
 import psutil
 import pygit2
 from tortoise import Tortoise
+from tortoise.exceptions import DBConnectionError
 from tortoise.functions import Count
 from typing_extensions import Annotated
 
-from cogs.models import Blacklist, Commands
+from cogs.models import ROLLUPS, AuthorRollups, Blacklist, Commands
 from cogs.translations import get_translation_callable, intcomma
 from main import currentdate
+from src.config import STATS_FLUSH_ROWS, STATS_FLUSH_SECONDS, STATS_RETRY_MAX_SECONDS, STATS_SPOOL_MAX_BYTES, STATS_SPOOL_PATH
+from src.spool import Spool
 from utils import (
     BotU,
     CogU,
@@ -75,6 +79,9 @@ log = logging.getLogger(__name__)
 
 LOGGING_CHANNEL = 1277467073810923561
 
+# the database can't be reached, anything else a write raises is a problem with the rows themselves
+CONNECTION_ERRORS = (OSError, asyncpg.PostgresConnectionError, DBConnectionError)
+
 badges_to_emoji = {
     'partner': emojidict.get('partner'),
     'verified_bot_developer': emojidict.get('verified_bot_developer'),
@@ -142,8 +149,21 @@ class Stats(CogU, name="Statistics", hidden=True):
     def __init__(self, bot: BotU):
         self.bot: BotU = bot
         self.process = psutil.Process()
+        # held while a batch is being written, commands keep registering into a fresh buffer meanwhile
         self._batch_lock = asyncio.Lock()
-        self._data_batch: list[DataBatchEntry] = []
+        # command_id -> entry, the buffer new commands go into and the one being written
+        self._data_batch: dict[int, DataBatchEntry] = {}
+        self._flushing: dict[int, DataBatchEntry] = {}
+        # when the oldest waiting entry was registered, the flush deadline counts from it
+        self._batch_started: Optional[float] = None
+        self._batch_waiting = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self.flush_failures = 0
+        self.flush_stats = {'flushes': 0, 'rows': 0, 'last_rows': 0, 'last_latency': 0.0, 'max_latency': 0.0, 'total_latency': 0.0, 'replayed': 0}
+        # every entry is spooled to disk before it is batched, so an outage or restart doesn't lose it
+        self.spool = Spool(STATS_SPOOL_PATH, STATS_SPOOL_MAX_BYTES)
+        if self.spool.segments():
+            self._batch_waiting.set()
         self.bulk_insert_loop.add_exception_type(asyncpg.PostgresConnectionError)
         self.bulk_insert_loop.start()
         self._logging_queue = asyncio.Queue()
@@ -176,29 +196,156 @@ class Stats(CogU, name="Statistics", hidden=True):
         #     if total > 1:
         #         log.info('Registered %s commands to the database.', total)
         #     self._data_batch.clear()
-        if self._data_batch:
-            await Commands.bulk_insert(self._data_batch) # type: ignore
-            total = len(self._data_batch)
-            if total > 1:
-                log.info('Registered %s commands to the database.', total)
-            self._data_batch.clear()
-        else:
+        if not self._data_batch:
             log.debug('No commands to insert.')
+            return
+
+        # swap buffers, anything registered while this writes goes into the new one
+        self._flushing, self._data_batch = self._data_batch, {}
+        self._batch_started = None
+        self._batch_waiting.clear()
+        self._batch_full.clear()
+        segment = self.spool.rotate()
+        start = time.perf_counter()
+        try:
+            await Commands.bulk_insert(list(self._flushing.values())) # type: ignore
+        except Exception as e:
+            if isinstance(e, CONNECTION_ERRORS):
+                # the rows stay in their spool segment and are replayed once the database is back
+                self._batch_waiting.set()
+                raise
+            # not an outage, so retrying won't help. Set the batch aside rather than stop the loop over it
+            log.error('Could not write %s commands, moved %s to %s.failed: %s', len(self._flushing), segment, segment, e)
+            if segment is not None:
+                await asyncio.to_thread(self.spool.set_aside, segment)
+            return
+        except BaseException:
+            # cancelled mid write, the segment is replayed on the next flush or start
+            self._batch_waiting.set()
+            raise
+        finally:
+            total = len(self._flushing)
+            self._flushing = {}
+        if segment is not None:
+            self.spool.remove(segment)
+
+        elapsed = time.perf_counter() - start
+        stats = self.flush_stats
+        stats['flushes'] += 1
+        stats['rows'] += total
+        stats['last_rows'] = total
+        stats['last_latency'] = elapsed
+        stats['max_latency'] = max(stats['max_latency'], elapsed)
+        stats['total_latency'] += elapsed
+
+        if total > 1:
+            log.info('Registered %s commands to the database in %.3fs.', total, elapsed)
+
+    async def replay_spool(self) -> None:
+        """Writes the spool segments left by failed flushes or a previous run, oldest first."""
+        for segment in self.spool.segments():
+            rows = await asyncio.to_thread(self.spool.read, segment)
+            try:
+                # a command registered twice was spooled twice, the later entry wins like in the batch
+                entries = {row['command_id']: row for row in rows}
+                for entry in entries.values():
+                    entry['used'] = datetime.datetime.fromisoformat(entry['used'])
+                if entries:
+                    await Commands.bulk_insert(list(entries.values())) # type: ignore
+            except CONNECTION_ERRORS:
+                raise
+            except Exception as e:
+                # not an outage, so retrying won't help. Set it aside rather than block every replay after it
+                log.error('Could not replay %s, moved it to %s.failed: %s', segment, segment, e)
+                await asyncio.to_thread(self.spool.set_aside, segment)
+                continue
+            self.spool.remove(segment)
+            self.flush_stats['replayed'] += len(entries)
+            log.info('Replayed %s spooled commands to the database.', len(entries))
+
+    def spill(self) -> None:
+        """Drops the waiting batch from memory while the database is down, it is already in the spool."""
+        self.spool.rotate()
+        self._data_batch = {}
+        self._batch_started = None
+        self._batch_full.clear()
 
     async def cog_unload(self):
-        self.bulk_insert_loop.stop()
+        # the loop sleeps until there is something to write, so it would never see stop()
+        self.bulk_insert_loop.cancel()
         self.logging_worker.cancel()
         #self.log_new_authorized_users.stop()
+        # everything is in the spool already, this just saves replaying it on the next start
+        try:
+            await asyncio.wait_for(self.do_bulk_insert(), timeout=10)
+        except Exception as e:
+            log.warning('Could not write waiting commands on unload, they will be replayed from the spool: %s', e)
+        self.spool.close()
 
-    @tasks.loop(seconds=10.0)
+    @tasks.loop(seconds=0.0)
     async def bulk_insert_loop(self):
-        if not self._data_batch:
-            return
-        await self.do_bulk_insert()
-        
+        # idle until a command comes in, then write once the batch is big enough or old enough
+        await self._batch_waiting.wait()
+        if self._batch_started is not None:
+            deadline = self._batch_started + STATS_FLUSH_SECONDS - time.monotonic()
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), timeout=max(deadline, 0))
+            except asyncio.TimeoutError:
+                pass
+
+        try:
+            await self.do_bulk_insert()
+        except CONNECTION_ERRORS as e:
+            # the rows are in the spool, back off so an outage isn't hammered every few seconds
+            self.flush_failures += 1
+            delay = min(STATS_FLUSH_SECONDS * 2 ** self.flush_failures, STATS_RETRY_MAX_SECONDS)
+            log.warning('Could not write commands to the database, retrying in %ss: %s', delay, e)
+            retry_at = time.monotonic() + delay
+            while (remaining := retry_at - time.monotonic()) > 0:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                # keep memory flat during the outage, full batches only live on disk
+                self.spill()
+        else:
+            self.flush_failures = 0
+
+    @bulk_insert_loop.before_loop
+    async def before_bulk_insert(self):
+        # the rollups start out empty when they are first deployed, and the all time stats would
+        # read 0 until they were rebuilt. Fill them before any batch is counted into them
+        try:
+            if await Commands.all().exists():
+                start = time.perf_counter()
+                count = await self.backfill_rollups(only_empty=True)
+                if count:
+                    log.info('Backfilled %s rollup rows from the command history in %.2fs.', count, time.perf_counter() - start)
+        except Exception as e:
+            # an error here would stop the loop before it ever ran, the stats backfill command can be run later instead
+            log.error('Could not backfill the command rollups: %s', e)
+
+    async def backfill_rollups(self, *, only_empty: bool = False) -> int:
+        """Rebuilds the command rollups from the raw command history, returning how many rows were written.
+
+        With ``only_empty`` the rollups that already have rows are left alone.
+        """
+        count = 0
+        # hold off flushes so no batch lands between the delete and the rebuild
+        async with self._batch_lock:
+            for rollup in ROLLUPS:
+                if only_empty and await rollup.all().exists():
+                    continue
+                count += await rollup.backfill()
+        return count
+
     async def do_bulk_insert(self):
         async with self._batch_lock:
             await self.bulk_insert()
+            await self.replay_spool()
+            # the loop wakes on this, left set with nothing to write it would spin
+            if not self._data_batch and not self.spool.segments():
+                self._batch_waiting.clear()
 
     @tasks.loop(seconds=0.0)
     async def logging_worker(self):
@@ -261,69 +408,50 @@ class Stats(CogU, name="Statistics", hidden=True):
         #         break
         #     await asyncio.sleep(5)
 
-        transaction_id = None
-
-        async with self._batch_lock:
-            for data in self._data_batch:
-                if data['command_id'] == ctx.interaction.id if ctx.interaction else ctx.message.id and data['used'] == message.created_at:
-                    transaction_id = data['transaction_id']
-                    self._data_batch.remove(data)
-                    if is_app_command:
-                        assert ctx.interaction is not None
-                        guild_install = ctx.interaction.is_guild_integration()
-                        user_install = ctx.interaction.is_user_integration()
-                    else:
-                        guild_install = ctx.guild is not None
-                        user_install = False
-                    self._data_batch.append(
-                        {
-                            'guild': guild_id,
-                            'channel': ctx.channel.id,
-                            'author': ctx.author.id,
-                            'used': message.created_at, # created_at 
-                            'prefix': ctx.prefix,
-                            'command': command,
-                            'failed': ctx.command_failed,
-                            'app_command': is_app_command,
-                            'is_guild_install': guild_install,
-                            'is_user_install': user_install,
-                            'args': args,
-                            'kwargs': kwargs,
-                            'command_id': ctx.interaction.id if ctx.interaction else ctx.message.id,
-                            'transaction_id': transaction_id,
-                        } # type: ignore
-                    )
-                    return
-    
-        if not transaction_id:
+        command_id = ctx.interaction.id if ctx.interaction else ctx.message.id
+        # a command is registered again if it errors, that use keeps its transaction and replaces the first entry
+        pending = self._data_batch.get(command_id) or self._flushing.get(command_id)
+        if pending is not None:
+            transaction_id = pending['transaction_id']
+        else:
             transaction_id = generate_transaction_id(guild_id=guild_id, user_id=ctx.author.id)
 
-        async with self._batch_lock:
-            if is_app_command:
-                assert ctx.interaction is not None
-                guild_install = ctx.interaction.is_guild_integration()
-                user_install = ctx.interaction.is_user_integration()
-            else:
-                guild_install = ctx.guild is not None
-                user_install = False
-            self._data_batch.append(
-                {
-                    'guild': guild_id,
-                    'channel': ctx.channel.id,
-                    'author': ctx.author.id,
-                    'used': message.created_at, # created_at 
-                    'prefix': ctx.prefix,
-                    'command': command,
-                    'failed': ctx.command_failed,
-                    'app_command': is_app_command,
-                    'is_guild_install': guild_install,
-                    'is_user_install': user_install,
-                    'args': args,
-                    'kwargs': kwargs,
-                    'command_id': ctx.interaction.id if ctx.interaction else ctx.message.id,
-                    'transaction_id': transaction_id,
-                } # type: ignore
-            )
+        if is_app_command:
+            assert ctx.interaction is not None
+            guild_install = ctx.interaction.is_guild_integration()
+            user_install = ctx.interaction.is_user_integration()
+        else:
+            guild_install = ctx.guild is not None
+            user_install = False
+
+        if not self._data_batch:
+            self._batch_started = time.monotonic()
+            self._batch_waiting.set()
+
+        # no await between here and the flush swapping buffers, so no lock is needed
+        entry: DataBatchEntry = {
+            'guild': guild_id,
+            'channel': ctx.channel.id,
+            'author': ctx.author.id,
+            'used': message.created_at, # created_at 
+            'prefix': ctx.prefix,
+            'command': command,
+            'failed': ctx.command_failed,
+            'app_command': is_app_command,
+            'is_guild_install': guild_install,
+            'is_user_install': user_install,
+            'args': args,
+            'kwargs': kwargs,
+            'command_id': command_id,
+            'transaction_id': transaction_id,
+        } # type: ignore
+        try:
+            self.spool.append(entry) # type: ignore
+        except OSError as e:
+            log.error('Could not spool command %s, it is only kept in memory: %s', command_id, e)
+        self._data_batch[command_id] = entry
+        if len(self._data_batch) >= STATS_FLUSH_ROWS:
+            self._batch_full.set()
         # await Commands.create(
         #     guild_id=guild_id,
         #     channel=ctx.channel.id,
@@ -622,9 +750,16 @@ class Stats(CogU, name="Statistics", hidden=True):
         # query = "SELECT COUNT(*), MIN(used) FROM _("Commands") WHERE guild_id=$1;"
         # count: tuple[int, datetime.datetime] = await ctx.db.fetchrow(query, ctx.guild.id)  # type: ignore
 
-        qs = Commands.filter(guild_id=ctx.guild.id).order_by('used')
+        # qs = Commands.filter(guild_id=ctx.guild.id).order_by('used')
+        # count = await qs.count(), getattr((await qs.first()), 'used', None)
+
+        query = 'SELECT CAST(SUM(uses) AS BIGINT) AS "count", MIN(first_used) AS "min" FROM "AuthorRollups" WHERE guild_id=$1;'
 
-        count = await qs.count(), getattr((await qs.first()), 'used', None)
+        conn = Tortoise.get_connection('default')
+        query = await conn.execute_query(query, [ctx.guild.id])
+        await conn.close()
+
+        count = query[1][0].get('count') or 0, query[1][0].get('min')
 
         embed.description = _("`{}` commands used.").format(intcomma(count[0]))
         if count[1]:
@@ -636,8 +771,8 @@ class Stats(CogU, name="Statistics", hidden=True):
         embed.set_footer(text=await __('Tracking command usage since'), icon_url=self.bot.user.display_avatar.url).timestamp = timestamp
 
         query = """SELECT command,
-                          COUNT(*) as "uses"
-                   FROM "Commands"
+                          CAST(SUM(uses) AS BIGINT) as "uses"
+                   FROM "CommandRollups"
                    WHERE guild_id=$1
                    GROUP BY command
                    ORDER BY "uses" DESC
@@ -701,8 +836,8 @@ class Stats(CogU, name="Statistics", hidden=True):
         embed.add_field(name='\u200b', value='\u200b', inline=True)
 
         query = """SELECT author_id,
-                          COUNT(*) AS "uses"
-                   FROM "Commands"
+                          CAST(SUM(uses) AS BIGINT) AS "uses"
+                   FROM "AuthorRollups"
                    WHERE guild_id=$1
                    GROUP BY author_id
                    ORDER BY "uses" DESC
@@ -787,13 +922,13 @@ class Stats(CogU, name="Statistics", hidden=True):
         embed.set_author(name=str(member), icon_url=member.display_avatar.url)
 
         # total command uses
-        query = "SELECT COUNT(*), MIN(used) FROM \"Commands\" WHERE guild_id=$1 AND author_id=$2;"
+        query = "SELECT CAST(SUM(uses) AS BIGINT) AS \"count\", MIN(first_used) AS \"min\" FROM \"AuthorRollups\" WHERE guild_id=$1 AND author_id=$2;"
         
         conn = Tortoise.get_connection('default')
         query = await conn.execute_query(query, [ctx.guild.id, member.id])
         await conn.close()
 
-        count = query[1][0].get('count'), query[1][0].get('min')
+        count = query[1][0].get('count') or 0, query[1][0].get('min')
         # count: tuple[int, datetime.datetime] = await ctx.db.fetchrow(query, ctx.guild.id, member.id)  # type: ignore
 
 
@@ -808,6 +943,7 @@ class Stats(CogU, name="Statistics", hidden=True):
 
         embed.set_footer(text=await __('First command used')).timestamp = timestamp
 
+        # no rollup is kept per member and command, their own rows are counted straight off the (guild_id, author_id, command) index
         query = """SELECT command,
                           COUNT(*) as "uses"
                    FROM "Commands"
@@ -887,7 +1023,14 @@ class Stats(CogU, name="Statistics", hidden=True):
         __ = await get_translation_callable(ctx.interaction)
         # query = "SELECT COUNT(*) FROM "Commands";"
         # total: tuple[int] = await ctx.db.fetchrow(query)  # type: ignore
-        total = await Commands.all().count()
+        # total = await Commands.all().count()
+        query = 'SELECT CAST(SUM(uses) AS BIGINT) AS "total" FROM "AuthorRollups";'
+
+        conn = Tortoise.get_connection('default')
+        query = await conn.execute_query(query)
+        await conn.close()
+
+        total = query[1][0].get('total') or 0
 
         e = makeembed_bot(title=await __("Command Stats"), color=discord.Colour.blurple(), footer_icon_url=self.bot.user.display_avatar.url)
         e.description = _("`{}` commands used.").format(intcomma(total))
@@ -900,8 +1043,8 @@ class Stats(CogU, name="Statistics", hidden=True):
             '\N{SPORTS MEDAL}',
         )
 
-        query = """SELECT command, COUNT(*) AS "uses"
-                   FROM "Commands"
+        query = """SELECT command, CAST(SUM(uses) AS BIGINT) AS "uses"
+                   FROM "CommandRollups"
                    GROUP BY command
                    ORDER BY "uses" DESC
                    LIMIT 5;
@@ -930,8 +1073,8 @@ class Stats(CogU, name="Statistics", hidden=True):
         value = '\n'.join(await __("{}: {} (`{}` uses)").format(lookup[index], command_mentions[index], intcomma(uses)) for (index, (command, uses)) in enumerate(results))
         e.add_field(name=await __("Top Commands"), value=value, inline=False)
 
-        query = """SELECT guild_id, COUNT(*) AS "uses"
-                   FROM "Commands"
+        query = """SELECT guild_id, CAST(SUM(uses) AS BIGINT) AS "uses"
+                   FROM "AuthorRollups"
                    GROUP BY guild_id
                    ORDER BY "uses" DESC
                    LIMIT 5;
@@ -943,11 +1086,12 @@ class Stats(CogU, name="Statistics", hidden=True):
 
         results = []
         for row in query[1]:
-            results.append((row.get('guild_id'), row.get('uses')))
+            # the rollups file commands used outside of a guild under 0
+            results.append((row.get('guild_id') or None, row.get('uses')))
         
-        query = """SELECT is_user_install, COUNT(*) AS "uses"
-                   FROM "Commands"
-                   WHERE guild_id IS NULL
+        query = """SELECT is_user_install, CAST(SUM(uses) AS BIGINT) AS "uses"
+                   FROM "CommandRollups"
+                   WHERE guild_id = 0
                    GROUP BY is_user_install
                    ORDER BY "uses" DESC
                    LIMIT 5;
@@ -1008,8 +1152,8 @@ class Stats(CogU, name="Statistics", hidden=True):
 
         e.add_field(name=await __("Top Guilds"), value='\n'.join(value), inline=False)
 
-        query = """SELECT author_id, COUNT(*) AS "uses"
-                   FROM "Commands"
+        query = """SELECT author_id, CAST(SUM(uses) AS BIGINT) AS "uses"
+                   FROM "AuthorRollups"
                    GROUP BY author_id
                    ORDER BY "uses" DESC
                    LIMIT 5;
@@ -1023,7 +1167,8 @@ class Stats(CogU, name="Statistics", hidden=True):
 
         results = []
         for row in query[1]:
-            guild_id = (await Commands.filter(author_id=row.get('author_id'), guild_id__isnull=False).order_by('-created_at').first()).guild_id
+            latest = await AuthorRollups.filter(author_id=row.get('author_id'), guild_id__not=0).order_by('-day').first()
+            guild_id = latest.guild_id if latest else None
             results.append((row.get('author_id'), row.get('uses'), guild_id))
 
         # records = await Commands.all().group_by('author').order_by('-used')
@@ -1154,6 +1299,7 @@ class Stats(CogU, name="Statistics", hidden=True):
         query = """SELECT is_user_install, COUNT(*) AS "uses"
                    FROM "Commands"
                    WHERE guild_id IS NULL
+                   AND used > (CURRENT_TIMESTAMP - INTERVAL '1 day')
                    GROUP BY is_user_install
                    ORDER BY "uses" DESC
                    LIMIT 5;
@@ -1241,7 +1387,8 @@ class Stats(CogU, name="Statistics", hidden=True):
 
         results = []
         for row in query[1]:
-            guild_id = (await Commands.filter(author_id=row.get('author_id'), guild_id__isnull=False).order_by('-created_at').first()).guild_id
+            latest = await AuthorRollups.filter(author_id=row.get('author_id'), guild_id__not=0).order_by('-day').first()
+            guild_id = latest.guild_id if latest else None
             results.append((row.get('author_id'), row.get('uses'), guild_id))
 
         value = []
@@ -1262,6 +1409,18 @@ class Stats(CogU, name="Statistics", hidden=True):
         e.add_field(name=await __("Top Users"), value='\n'.join(value), inline=False)
         await ctx.reply(embed=e)
 
+    @stats.command(name='backfill', hidden=True)
+    @commands.is_owner()
+    async def stats_backfill(self, ctx: ContextU):
+        """Rebuilds the command rollups from the raw command history."""
+        await ctx.defer()
+
+        start = time.perf_counter()
+        count = await self.backfill_rollups()
+        elapsed = time.perf_counter() - start
+
+        await ctx.reply(f'Rebuilt `{intcomma(count)}` rollup rows in `{elapsed:.2f}s`.')
+
     async def send_guild_stats(self, e: discord.Embed, guild: discord.Guild):
         e.add_field(name='Name', value=guild.name)
         e.add_field(name='ID', value=guild.id)
@@ -1499,9 +1658,43 @@ class Stats(CogU, name="Statistics", hidden=True):
         embed.add_field(name='Inner Tasks', value=f'Total: `{len(inner_tasks)}`\nFailed: `{bad_inner_tasks or "None"}`')
         embed.add_field(name='Events Waiting', value=f'Total: `{len(event_tasks)}`', inline=False)
 
-        command_waiters = len(self._data_batch)
+        command_waiters = len(self._data_batch) + len(self._flushing)
         is_locked = self._batch_lock.locked()
         description.append(f'Commands Waiting: `{command_waiters}`, Batch Locked: {emojidict.get(is_locked)}')
+        flush_stats = self.flush_stats
+        if flush_stats['flushes']:
+            description.append(
+                f"Command Flushes: `{flush_stats['flushes']}`, Last: `{flush_stats['last_rows']}` rows in `{flush_stats['last_latency'] * 1000:.1f}ms`, "
+                f"Avg: `{flush_stats['rows'] / flush_stats['flushes']:.1f}` rows in `{flush_stats['total_latency'] / flush_stats['flushes'] * 1000:.1f}ms`"
+            )
+        if self.flush_failures or self.spool.dropped or flush_stats['replayed']:
+            description.append(
+                f"Command Flush Failures: `{self.flush_failures}`, Replayed: `{flush_stats['replayed']}`, Dropped: `{self.spool.dropped}`, "
+                f"Spooled: `{self.spool.size() / 1024:.1f}` KiB"
+            )
+
+        if wiki := self.bot.get_cog('Farm Computer'):
+            cache_stats = wiki.cache.stats() # type: ignore
+            embed.add_field(
+                name='Wiki Cache',
+                value=f"`{cache_stats['entries']}` pages, `{cache_stats['bytes'] / 1024**2:.2f}` MiB\n"
+                      f"Hits: `{cache_stats['hits']}`, Misses: `{cache_stats['misses']}`\n"
+                      f"Evictions: `{cache_stats['evictions']}`, Expired: `{cache_stats['expirations']}`\n"
+                      f"In-flight: `{cache_stats['inflight']}`, Coalesced: `{cache_stats['coalesced']}`\n"
+                      f"Revalidated: `{cache_stats['revalidated']}`, Served Stale: `{cache_stats['stale_served']}`",
+                inline=False,
+            )
+
+            parser_stats = wiki.parser.stats() # type: ignore
+            embed.add_field(
+                name='Wiki Parser',
+                value=f"`{parser_stats['workers']}` {parser_stats['kind']} workers on `{parser_stats['backend']}`, `{parser_stats['pending']}` queued\n"
+                      f"Parsed: `{parser_stats['parsed']}`, Avg: `{parser_stats['average'] * 1000:.1f}ms`, Max: `{parser_stats['max'] * 1000:.1f}ms`",
+                inline=False,
+            )
+            if parser_stats['pending'] >= parser_stats['workers'] * 4:
+                total_warnings += 1
+                embed.colour = WARNING
 
         memory_usage = self.process.memory_full_info().uss / 1024**2
         cpu_usage = self.process.cpu_percent() / psutil.cpu_count()
@@ -1510,7 +1703,7 @@ class Stats(CogU, name="Statistics", hidden=True):
         global_rate_limit = not self.bot.http._global_over.is_set()
         description.append(f'Global Rate Limit: {emojidict.get(global_rate_limit)}')
 
-        if command_waiters >= 8:
+        if command_waiters >= STATS_FLUSH_ROWS or self.flush_failures:
             total_warnings += 1
             embed.colour = WARNING
 
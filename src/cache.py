@@ -1,51 +1,510 @@
-from datetime import datetime
-from typing import Dict, Union
+import asyncio
+from collections import OrderedDict
+import sqlite3
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, Generic, Iterable, Mapping, Optional, TypeVar, Union
+import urllib.parse
 
+import aiohttp
 import discord
+from discord.ext import tasks
 
 from utils import BotU
 
-from .config import CLEAR_CACHE_HOURS
+from .config import (
+    CACHE_MAX_BYTES,
+    CACHE_MAX_ENTRIES,
+    CACHE_SERVE_STALE_MINUTES,
+    CACHE_STALE_HOURS,
+    CACHE_STORE_MAX_ENTRIES,
+    CACHE_STORE_PATH,
+    CACHE_SWEEP_MINUTES,
+    CLEAR_CACHE_HOURS,
+    MISSING_CACHE_MAX_ENTRIES,
+    MISSING_CACHE_MINUTES,
+)
+from .embed import EmbedBuilder
 from .logger import Logger
+from .store import PageStore, StoredPage
+from .titles import normalise_title
+
+T = TypeVar('T')
+
+
+def approximate_size(obj: Any, _seen: Optional[set] = None) -> int:
+    """Roughly how many bytes ``obj`` keeps alive, following containers and instance attributes."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        size += sum(approximate_size(k, _seen) + approximate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(x, _seen) for x in obj)
+    else:
+        if hasattr(obj, '__dict__'):
+            size += approximate_size(vars(obj), _seen)
+        for name in getattr(type(obj), '__slots__', ()):
+            size += approximate_size(getattr(obj, name, None), _seen)
+    return size
+
+
+def normalise_url(url: str) -> str:
+    """Normalises a wiki url so that every spelling of the same page maps to one cache key."""
+    parts = urllib.parse.urlsplit(str(url).strip())
+    path = urllib.parse.unquote(parts.path).replace(' ', '_')
+    # mediawiki titles are case insensitive on their first letter only
+    if len(path) > 1:
+        path = '/' + path[1].upper() + path[2:]
+    return urllib.parse.urlunsplit((
+        (parts.scheme or 'https').lower(),
+        parts.netloc.lower(),
+        urllib.parse.quote(path, safe="/:_-.'(),!"),
+        parts.query,
+        '',
+    ))
+
+
+class CacheEntry(Generic[T]):
+    __slots__ = ('value', 'stored_at', 'size')
+
+    def __init__(self, value: T, size: int, stored_at: Optional[float] = None):
+        self.value = value
+        self.size = size
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class LRUCache(Generic[T]):
+    """A least-recently-used cache bounded by entry count and approximate size in bytes.
+
+    Entries older than ``ttl`` seconds are treated as misses. They are kept around for
+    another ``stale_ttl`` seconds so they can still be fetched with :meth:`get_stale`,
+    after which they are dropped on access or by :meth:`sweep`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        stale_ttl: float = 0,
+        sizeof: Callable[[Any], int] = approximate_size,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.sizeof = sizeof
+        self._entries: OrderedDict[str, CacheEntry[T]] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def is_expired(self, entry: CacheEntry) -> bool:
+        return self.ttl is not None and entry.age > self.ttl
+
+    def is_dead(self, entry: CacheEntry) -> bool:
+        return self.ttl is not None and entry.age > self.ttl + self.stale_ttl
+
+    def get_entry(self, key: str, count: bool = True) -> Optional[CacheEntry[T]]:
+        """The live entry for ``key``, or None. ``count`` is off for rechecks, so hits and misses stay one per lookup."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += count
+            return None
+        if self.is_expired(entry):
+            if self.is_dead(entry):
+                self._remove(key)
+                self.expirations += 1
+            self.misses += count
+            return None
+        self._entries.move_to_end(key)
+        self.hits += count
+        return entry
+
+    def get(self, key: str, default: Optional[T] = None) -> Optional[T]:
+        entry = self.get_entry(key)
+        return default if entry is None else entry.value
+
+    def get_stale(self, key: str) -> Optional[CacheEntry[T]]:
+        """Returns the entry for ``key`` even if it has expired, as long as it is still being kept."""
+        entry = self._entries.get(key)
+        if entry is None or self.is_dead(entry):
+            return None
+        return entry
+
+    def refresh(self, key: str, stored_at: Optional[float] = None) -> None:
+        """Marks the entry for ``key`` as fresh again without replacing its value."""
+        entry = self._entries[key]
+        entry.stored_at = time.time() if stored_at is None else stored_at
+        self._entries.move_to_end(key)
+
+    def set(self, key: str, value: T, size: Optional[int] = None, stored_at: Optional[float] = None) -> CacheEntry[T]:
+        if key in self._entries:
+            self._remove(key)
+        entry = CacheEntry(value, self.sizeof(value) if size is None else size, stored_at)
+        self._entries[key] = entry
+        self.nbytes += entry.size
+        self._evict()
+        return entry
+
+    def pop(self, key: str) -> Optional[T]:
+        if key not in self._entries:
+            return None
+        return self._remove(key).value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.nbytes = 0
+
+    def keys(self) -> Iterable[str]:
+        return self._entries.keys()
+
+    def sweep(self) -> int:
+        """Drops every entry past its stale window, returning how many were removed."""
+        if self.ttl is None:
+            return 0
+        expired = [key for key, entry in self._entries.items() if self.is_dead(entry)]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        return len(expired)
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.nbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def _remove(self, key: str) -> CacheEntry[T]:
+        entry = self._entries.pop(key)
+        self.nbytes -= entry.size
+        return entry
+
+    def _evict(self) -> None:
+        # always keep the newest entry, even if it is bigger than the whole budget
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+
+def embed_payload(emb: Union[EmbedBuilder, discord.Embed, dict]) -> dict:
+    """The ``discord.Embed.to_dict()`` form of ``emb``, building it if it is still a builder."""
+    if isinstance(emb, dict):
+        # pages stored before the cache kept built embeds hold the builder's own payload
+        if 'type' in emb:
+            return emb
+        emb = EmbedBuilder.from_dict(emb)
+    if isinstance(emb, EmbedBuilder):
+        emb = emb.build()
+    return emb.to_dict() # type: ignore
+
+
+class CachedPage:
+    """A parsed page, already built into an embed payload, along with the validators the wiki sent for it.
+
+    The payload is never handed out directly, every hit gets an embed of its own.
+    """
+    __slots__ = ('payload', 'etag', 'last_modified')
+
+    def __init__(self, payload: dict, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.payload = payload
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def build(self) -> discord.Embed:
+        # from_dict keeps references into the payload. The set_* methods replace the
+        # nested dicts rather than editing them, so only the fields need copying
+        data = dict(self.payload)
+        if 'fields' in data:
+            data['fields'] = [field.copy() for field in data['fields']]
+        return discord.Embed.from_dict(data)
 
 
 class Cache:
     logger: Logger
-    cache: Dict[str, Dict[str, Union[discord.Embed, datetime]]] = {}
+    store: Optional[PageStore] = None
 
     def __init__(self, logger, bot: BotU):
         self.logger = logger
         self.bot = bot
-        pass
+        self.pages: LRUCache[CachedPage] = LRUCache(
+            max_entries=CACHE_MAX_ENTRIES,
+            max_bytes=CACHE_MAX_BYTES,
+            ttl=CLEAR_CACHE_HOURS * 3600,
+            # expired pages are kept for a while so they can be revalidated instead of re-downloaded
+            stale_ttl=CACHE_STALE_HOURS * 3600,
+        )
+        # redirect and search urls that resolved to a page we have cached
+        self.aliases: LRUCache[str] = LRUCache(
+            max_entries=CACHE_MAX_ENTRIES * 4,
+            ttl=(CLEAR_CACHE_HOURS + CACHE_STALE_HOURS) * 3600,
+        )
+        # titles the wiki has no page for, so repeated misses don't go upstream
+        self.missing: LRUCache[bool] = LRUCache(
+            max_entries=MISSING_CACHE_MAX_ENTRIES,
+            ttl=MISSING_CACHE_MINUTES * 60,
+            sizeof=lambda _: 0,
+        )
+        # lookups currently being fetched, so concurrent misses share one request
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+        self.revalidated = 0
+        # pages being refreshed in the background while their stale copy is served
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.stale_served = 0
+        if CACHE_STORE_PATH:
+            self.store = PageStore(CACHE_STORE_PATH, CACHE_STORE_MAX_ENTRIES)
+        self.sweeper.start()
 
-    async def get(self, query: str) -> dict:
+    def close(self) -> None:
+        self.sweeper.cancel()
+        for task in self._refreshing.values():
+            task.cancel()
+        if self.store is not None:
+            self.store.close()
+
+    async def load(self) -> None:
+        """Warms the in-memory cache from the on-disk store."""
+        if self.store is None:
+            return
+
+        try:
+            pages, aliases = await asyncio.to_thread(self.store.load, CACHE_MAX_ENTRIES)
+        except sqlite3.Error as e:
+            self.logger.error(f'Failed to load the page cache from {CACHE_STORE_PATH}: {e}')
+            return
+
+        # oldest first, so the most recently stored pages end up most recently used
+        for stored in reversed(pages):
+            if self.pages.ttl is not None and time.time() - stored.stored_at > self.pages.ttl + self.pages.stale_ttl:
+                continue
+            page = CachedPage(embed_payload(stored.payload), stored.etag, stored.last_modified)
+            self.pages.set(stored.url, page, stored_at=stored.stored_at)
+
+        for alias, url in aliases:
+            if url in self.pages:
+                self.aliases.set(alias, url, size=0)
+
+        self.logger.info(f'Loaded {len(self.pages)} cached pages from {CACHE_STORE_PATH}')
+
+    @tasks.loop(minutes=CACHE_SWEEP_MINUTES)
+    async def sweeper(self):
+        removed = self.pages.sweep() + self.aliases.sweep() + self.missing.sweep()
+        if removed:
+            self.logger.info(f'Swept {removed} expired cache entries ({len(self.pages)} pages, {self.pages.nbytes} bytes left)')
+
+    def stats(self) -> dict:
+        return {
+            **self.pages.stats(),
+            'coalesced': self.coalesced,
+            'inflight': len(self._inflight),
+            'revalidated': self.revalidated,
+            'stale_served': self.stale_served,
+            'refreshing': len(self._refreshing),
+            'missing': len(self.missing),
+        }
+
+    def is_missing(self, title: str) -> bool:
+        """Whether ``title`` recently turned out not to exist on the wiki."""
+        return self.missing.get(normalise_title(title)) is not None
+
+    def mark_missing(self, title: str) -> None:
+        self.missing.set(normalise_title(title), True)
+
+    def forget_missing(self, titles) -> int:
+        """Drops the remembered misses that are in ``titles``, a collection of wiki titles such as a :class:`TitleIndex`."""
+        found = [key for key in self.missing.keys() if key in titles]
+        for key in found:
+            self.missing.pop(key)
+        return len(found)
+
+    async def coalesce(self, query: str, factory: Callable[[], Awaitable[discord.Embed]]) -> discord.Embed:
+        """Runs ``factory`` once for every concurrent lookup of ``query``.
+
+        The first caller starts the lookup, everyone else arriving before it finishes
+        awaits the same task and gets a copy of its embed.
+        """
+        key = normalise_url(query)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            # shielded so a caller timing out doesn't cancel the lookup for the others
+            return await asyncio.shield(task)
+
+        self.coalesced += 1
+        self.logger.info(f'Joined in-flight lookup for {query}')
+        emb = await asyncio.shield(task)
+        return emb.copy()
+
+    def _key(self, query: str) -> str:
+        key = normalise_url(query)
+        if key in self.aliases:
+            key = self.aliases.get(key, key)
+        return key # type: ignore
+
+    def lookup(self, query: str, count: bool = True) -> Optional[discord.Embed]:
+        """Returns the cached embed for ``query`` without touching the network, or None.
+
+        Pass ``count=False`` when the lookup has already been counted as a hit or miss.
+        """
+        key = self._key(query)
+
+        entry = self.pages.get_entry(key, count)
+        if entry is None:
+            return None
+
+        self.logger.info(f'Found cache for {query} (mins since cache: {entry.age / 60})')
+        return entry.value.build()
+
+    async def get(
+        self,
+        query: str,
+        html: Optional[str] = None,
+        aliases: Iterable[str] = (),
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> discord.Embed:
         # em = wiki.parse(query, False)
 
-        if query in self.cache:
-            self.logger.info(f'Found cache for {query}')
-            hours_since_cache = (datetime.now() - self.cache[query]['time']).total_seconds() / 3600
-            
-            self.logger.info(f'Hours since cache: {hours_since_cache} (mins: {hours_since_cache * 60})')
-            if hours_since_cache > CLEAR_CACHE_HOURS:
-                self.logger.info(f'Clearing cache for {query}')
-                del self.cache[query]
-                return await self.get(query)
-            
-            emb = self.cache[query]['embed']
-            try: return emb.build()
-            except: return emb
-        
+        # callers have looked this up already, only a page cached in the meantime is new here
+        if (emb := self.lookup(query, count=False)) is not None:
+            return emb
+
         cog = self.bot.get_cog('Farm Computer')
-        self.cache[query] = {
-            'embed': await cog.parse(query, False),# type: ignore
-            'time': datetime.now()
-        }
+        emb = await cog.parse(query, False, html=html)# type: ignore
+        return await self.put(query, emb, aliases, headers)
+
+    async def revalidate(self, query: str, lookup=None) -> Optional[discord.Embed]:
+        """Revalidates an expired page with a conditional request.
+
+        A 304 just marks the cached page as fresh again, a 200 replaces it with the new body.
+        If the wiki can't be reached the stale page is returned as is.
+        Returns None if there is no expired page to revalidate or the page is gone.
+        """
+        key = self._key(query)
+        entry = self.pages.get_stale(key)
+        if entry is None:
+            return None
+
+        page = entry.value
+
+        cog = self.bot.get_cog('Farm Computer')
+        try:
+            status, html, title, validators = await cog.fetch_page(key, lookup, page.etag, page.last_modified) # type: ignore
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # stale-if-error, an old page beats no page at all
+            self.logger.error(f'Failed to revalidate {query}, serving stale copy: {e}')
+            self.stale_served += 1
+            return page.build()
+
+        if status == 304:
+            self.revalidated += 1
+            self.pages.refresh(key)
+            self.logger.info(f'{query} was not modified, refreshed cache')
+            if self.store is not None:
+                try:
+                    await asyncio.to_thread(self.store.touch, key, entry.stored_at)
+                except sqlite3.Error as e:
+                    self.logger.error(f'Failed to refresh {query} in {CACHE_STORE_PATH}: {e}')
+            return page.build()
+        elif status == 200:
+            emb = await cog.parse(key, False, html=html, title=title) # type: ignore
+            return await self.put(key, emb, (), validators)
+        elif status >= 500:
+            self.logger.error(f'Got {status} revalidating {query}, serving stale copy')
+            self.stale_served += 1
+            return page.build()
+
+        # the page is gone, let the caller look it up from scratch
+        self.pages.pop(key)
+        if self.store is not None:
+            # otherwise the next restart would load it right back
+            try:
+                await asyncio.to_thread(self.store.delete, key)
+            except sqlite3.Error as e:
+                self.logger.error(f'Failed to remove {query} from {CACHE_STORE_PATH}: {e}')
+        return None
+
+    def serve_stale(self, query: str) -> Optional[discord.Embed]:
+        """Returns a recently expired page straight away and refreshes it in the background.
+
+        Only pages that expired less than ``CACHE_SERVE_STALE_MINUTES`` ago are served this way.
+        """
+        key = self._key(query)
+        entry = self.pages.get_stale(key)
+        if entry is None or self.pages.ttl is None or entry.age > self.pages.ttl + CACHE_SERVE_STALE_MINUTES * 60:
+            return None
+
+        if key not in self._refreshing:
+            task = asyncio.ensure_future(self._background_refresh(key))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+        self.stale_served += 1
+        self.logger.info(f'Serving stale copy of {query} while it refreshes')
+        return entry.value.build()
+
+    async def _background_refresh(self, key: str) -> None:
+        try:
+            await self.revalidate(key)
+        except Exception as e:
+            # the stale copy stays cached, so the next lookup just tries again
+            self.logger.error(f'Background refresh of {key} failed: {e}')
+
+    async def put(
+        self,
+        query: str,
+        emb: Union[EmbedBuilder, discord.Embed],
+        aliases: Iterable[str] = (),
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> discord.Embed:
+        headers = headers or {}
+        # built once here, hits only ever copy the payload
+        page = CachedPage(embed_payload(emb), headers.get('ETag'), headers.get('Last-Modified'))
+        key = normalise_url(query)
+        entry = self.pages.set(key, page)
+        # the page may also be reachable through a redirect or the search page
+        alias_keys = [alias_key for alias in aliases if (alias_key := normalise_url(alias)) != key]
+        for alias_key in alias_keys:
+            self.aliases.set(alias_key, key, size=0)
         self.logger.info(f'Cached {query}')
-        emb = self.cache[query]['embed']
-        try: 
-            return emb.build()
-        except Exception: 
-            return emb
+
+        if self.store is not None:
+            stored = StoredPage(key, page.payload, page.etag, page.last_modified, entry.stored_at)
+            try:
+                await asyncio.to_thread(self.store.put, stored, alias_keys)
+            except sqlite3.Error as e:
+                self.logger.error(f'Failed to store {query} in {CACHE_STORE_PATH}: {e}')
+
+        return page.build()
 
 async def setup(bot: BotU):
-    pass
\ No newline at end of file
+    pass
@@ -5,6 +5,29 @@
 #CONFIG = json.load(file)
 
 CLEAR_CACHE_HOURS = 5
+CACHE_MAX_ENTRIES = 500 # most pages kept in memory at once, least recently used are evicted first
+CACHE_MAX_BYTES = 32 * 1024 * 1024 # rough memory budget for cached pages
+CACHE_STALE_HOURS = 48 # expired pages are kept this long to be revalidated with a conditional request instead of re-downloaded
+CACHE_SERVE_STALE_MINUTES = 60 # pages that expired less than this long ago are served immediately and refreshed in the background
+CACHE_SWEEP_MINUTES = 10 # how often expired pages are swept out of the cache
+CACHE_STORE_PATH = 'wiki_cache.sqlite3' # parsed pages are kept here between restarts, None keeps the cache in memory only
+CACHE_STORE_MAX_ENTRIES = 5000 # most pages kept on disk
+MISSING_CACHE_MAX_ENTRIES = 2000 # most titles remembered as not existing on the wiki
+MISSING_CACHE_MINUTES = 30 # how long a title is remembered as not existing, unless the title list finds it first
+WIKI_BACKEND = 'html' # 'html' scrapes rendered pages, 'api' uses the MediaWiki api for smaller responses and fewer requests
+WIKI_URL = 'https://stardewvalleywiki.com' # pages, searches and the api are all requested from here
+WIKI_API_URL = f'{WIKI_URL}/mediawiki/api.php'
+ALLPAGES_PATH = 'allpages.json' # the wiki's title list is saved here so restarts don't need a full crawl
+ALLPAGES_FULL_CRAWL_DAYS = 7 # a saved title list older than this is crawled again from scratch, otherwise only recent changes are applied
+ALLPAGES_CRAWL_CONCURRENCY = 4 # title ranges crawled at once during a full crawl
+PARSER_POOL = 'thread' # 'thread' or 'process', where wiki pages are parsed so the event loop isn't blocked
+PARSER_WORKERS = 2 # parses that can run at once
+PARSER_BACKEND = None # BeautifulSoup backend, 'lxml' or 'html.parser', None uses the fastest one installed
+STATS_FLUSH_ROWS = 200 # command uses are written to the database as soon as this many are waiting
+STATS_FLUSH_SECONDS = 10 # or once the oldest waiting one is this old, whichever comes first
+STATS_RETRY_MAX_SECONDS = 300 # longest wait between retries while the database is unreachable
+STATS_SPOOL_PATH = 'command_spool.jsonl' # command uses are written here before being batched, and replayed from here after an outage or crash
+STATS_SPOOL_MAX_BYTES = 64 * 1024 * 1024 # most disk used by command uses waiting for the database, the oldest are dropped past this
 OLD_WIKI_REDIRECT = True
 WIKITEXT_LINKING = True
 
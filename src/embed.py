@@ -1,16 +1,36 @@
 import discord
-from typing import Optional
+import sys
+from typing import Iterable, List, NamedTuple, Optional, Union
 
 from utils import makeembed_bot
 
+
+class EmbedField(NamedTuple):
+    name: str
+    value: str
+    inline: bool = False
+
+
+def make_field(field: Union[EmbedField, dict, list, tuple]) -> EmbedField:
+    """An :class:`EmbedField` from a field in any of the forms it gets stored or sent between processes in."""
+    if isinstance(field, dict):
+        name, value, inline = field['name'], field['value'], field.get('inline', False)
+    else:
+        name, value, inline = field
+    # section names like "Sell Price" repeat on nearly every page, so share one copy of each
+    return EmbedField(sys.intern(name), value, inline)
+
+
 class EmbedBuilder:
+    # builders are created for every page parsed, no need for a __dict__ on each
+    __slots__ = ('title', 'url', 'description', 'fields', 'color', 'footer', 'thumbnail', 'image')
 
     def __init__(
         self,
         title: str = '',
         url: str = '',
         description: str = '',
-        fields: Optional[list] = None,
+        fields: Optional[Iterable[Union[EmbedField, dict]]] = None,
         color: discord.Color = discord.Color.default(),
         footer: Optional[str] = None,
         thumbnail: Optional[str] = None,
@@ -19,12 +39,39 @@ class EmbedBuilder:
         self.title = title
         self.url = url
         self.description = description
-        self.fields = fields
+        self.fields: Optional[List[EmbedField]] = [make_field(field) for field in fields] if fields is not None else None
         self.color = color
         self.footer = footer
         self.thumbnail = thumbnail
         self.image = image
 
+    def add_field(self, name: str, value: str, inline: bool = False) -> None:
+        if self.fields is None:
+            self.fields = []
+        self.fields.append(EmbedField(sys.intern(name), value, inline))
+
+    def to_dict(self) -> dict:
+        """A json serialisable form of the builder, see :meth:`from_dict`."""
+        return {
+            'title': self.title,
+            'url': self.url,
+            'description': self.description,
+            'fields': [field._asdict() for field in self.fields] if self.fields is not None else None,
+            'color': self.color.value if self.color is not None else None,
+            'footer': self.footer,
+            'thumbnail': self.thumbnail,
+            'image': self.image,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'EmbedBuilder':
+        data = dict(data)
+        if data.get('color') is not None:
+            data['color'] = discord.Color(data['color'])
+        else:
+            data.pop('color', None)
+        return cls(**data)
+
     def __str__(self) -> str:
         # return self.build() as a dict
         return str(self.build().to_dict())
@@ -39,9 +86,9 @@ class EmbedBuilder:
         if self.fields:
             for field in self.fields:
                 embed.add_field(
-                    name=field['name'],
-                    value=field['value'],
-                    inline=field['inline']
+                    name=field.name,
+                    value=field.value,
+                    inline=field.inline
                 )
         if self.url:
             embed.url = self.url
@@ -1,81 +1,103 @@
+from functools import lru_cache
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+
 from utils import emojidict
 
-def getQualityFromPath(path):
-    if path.endswith('Iridium_Quality.png'):
-        return emojidict.get("iridium")
-    elif path.endswith('Gold_Quality.png'):
-        return emojidict.get("gold")
-    elif path.endswith('Silver_Quality.png'):
-        return emojidict.get("silver")
+# the wiki's icon files we have emojis for, a path is matched by the file name it ends with
+QUALITY_STARS = {
+    'Iridium_Quality.png': 'iridium',
+    'Gold_Quality.png': 'gold',
+    'Silver_Quality.png': 'silver',
+}
+HEALTH_ENERGY_POISON = {
+    'Health.png': '20pxHealth',
+    'Energy.png': '20pxEnergy',
+    'Poison.png': 'POISON',
+}
+QUALITY_ICONS = {
+    'Silver_Quality_Icon.png': 'SILVER',
+    'Gold_Quality_Icon.png': 'GOLD',
+    'Iridium_Quality_Icon.png': 'IRIDIUM',
+}
+QUALITY_HEALTH_ENERGY_POISON = {
+    (back, fore): f'{quality}_{back[:-len(".png")].upper()}'
+    for back, (fore, quality) in product(HEALTH_ENERGY_POISON, QUALITY_ICONS.items())
+}
+COIN_ICON = 'Gold_Quality_Icon.png'
+ICON_NAMES = (*QUALITY_STARS, *HEALTH_ENERGY_POISON, *QUALITY_ICONS)
+
 
+@lru_cache(maxsize=2048)
+def icon_name(path: Optional[str]) -> Optional[str]:
+    """Which of the known icons ``path`` points at, or None."""
+    if not path:
+        return None
+    for name in ICON_NAMES:
+        if path.endswith(name):
+            return name
     return None
 
-def getHealthEnergyPoisonFromPath(path):
-    if path.endswith('Health.png'):
-        return emojidict.get("20pxHealth")
-    elif path.endswith('Energy.png'):
-        return emojidict.get("20pxEnergy")
-    elif path.endswith('Poison.png'):
-        return emojidict.get("POISON")
 
+def _build_table() -> Dict[Tuple[Optional[str], Optional[str]], Tuple[str, ...]]:
+    # (background icon, foreground icon) -> the emojidict keys to try, best first,
+    # so a lookup follows the same precedence as checking each kind in turn would
+    table: Dict[Tuple[Optional[str], Optional[str]], Tuple[str, ...]] = {}
+    for back, fore in product((*ICON_NAMES, None), (*ICON_NAMES, None)):
+        names: List[str] = []
+        if back in QUALITY_STARS:
+            names.append(QUALITY_STARS[back])
+        if (back, fore) in QUALITY_HEALTH_ENERGY_POISON:
+            names.append(QUALITY_HEALTH_ENERGY_POISON[back, fore])
+        if back in HEALTH_ENERGY_POISON:
+            names.append(HEALTH_ENERGY_POISON[back])
+        if names:
+            table[back, fore] = tuple(names)
+    return table
+
+
+EMOJI_TABLE = _build_table()
+
+
+def emoji_for(back_path: Optional[str], foreimages=None, pagename=None) -> Optional[str]:
+    """The emoji for an infobox icon, from its background image path and foreground image divs."""
+    back = icon_name(back_path)
+    # the quality stars look the same whatever is drawn over them, so skip finding the foreground
+    fore = None if back in QUALITY_STARS else icon_name(fore_path(foreimages))
+    for name in EMOJI_TABLE.get((back, fore), ()):
+        if emoji := emojidict.get(name):
+            return emoji
+    if fore == COIN_ICON and pagename:
+        return emojidict.get("coin")
     return None
 
-def checkIfShouldBeGoldCoin(foreimages, path=None):
-    try:
-        if not path:
-            path = foreimages[0].find_all('img')[0]['src']
-
-        if path.endswith('Gold_Quality_Icon.png'):
-            return emojidict.get("coin")
-        else:
-            return None
-    except Exception as e:
+
+def fore_path(foreimages) -> Optional[str]:
+    if not foreimages:
         return None
+    # walking the tree by hand, find() costs more than everything else here put together
+    for el in foreimages[0].descendants:
+        if el.name == 'img':
+            return el.get('src')
+    return None
+
+
+def getQualityFromPath(path):
+    name = QUALITY_STARS.get(icon_name(path)) # type: ignore
+    return emojidict.get(name) if name else None
+
+def getHealthEnergyPoisonFromPath(path):
+    name = HEALTH_ENERGY_POISON.get(icon_name(path)) # type: ignore
+    return emojidict.get(name) if name else None
+
+def checkIfShouldBeGoldCoin(foreimages, path=None):
+    if not path:
+        path = fore_path(foreimages)
+    return emojidict.get("coin") if icon_name(path) == COIN_ICON else None
 
 def qualityHealthEnergyPoison(back_path, foreimages):
-    try:
-        imgs = foreimages[0].find_all('img')
-
-        if not len(imgs) > 0:
-            return None
-
-        fore_path = imgs[0]['src']
-
-        # print(f'fore_path: {fore_path}')
-        # print(f'back_path: {back_path}')
-
-        if fore_path.endswith('Silver_Quality_Icon.png'):
-            if back_path.endswith('Health.png'):
-                return emojidict.get("SILVER_HEALTH")
-            elif back_path.endswith('Energy.png'):
-                return emojidict.get("SILVER_ENERGY")
-            elif back_path.endswith('Poison.png'):
-                return emojidict.get("SILVER_POISON")
-        elif fore_path.endswith('Gold_Quality_Icon.png'):
-            if back_path.endswith('Health.png'):
-                return emojidict.get("GOLD_HEALTH")
-            elif back_path.endswith('Energy.png'):
-                return emojidict.get("GOLD_ENERGY")
-            elif back_path.endswith('Poison.png'):
-                return emojidict.get("GOLD_POISON")
-        elif fore_path.endswith('Iridium_Quality_Icon.png'):
-            if back_path.endswith('Health.png'):
-                return emojidict.get("IRIDIUM_HEALTH")
-            elif back_path.endswith('Energy.png'):
-                return emojidict.get("IRIDIUM_ENERGY")
-            elif back_path.endswith('Poison.png'):
-                return emojidict.get("IRIDIUM_POISON")
-    finally:
-        return None
+    name = QUALITY_HEALTH_ENERGY_POISON.get((icon_name(back_path), icon_name(fore_path(foreimages)))) # type: ignore
+    return emojidict.get(name) if name else None
 
 def identify(str, pagename=None, foreimages=None, backimage=None):
-    if q := getQualityFromPath(str):
-        return q
-    elif (q := qualityHealthEnergyPoison(str, foreimages)) and len(foreimages) > 0:
-        return q
-    elif h := getHealthEnergyPoisonFromPath(str):
-        return h
-    elif (g := checkIfShouldBeGoldCoin(foreimages)) and len(foreimages) > 0 and pagename:
-        return g
-
-    return None
+    return emoji_for(str, foreimages, pagename)
@@ -1,7 +1,7 @@
 import logging
 
 logger = logging.getLogger('computer')
-handler = logging.FileHandler(filename='computer.log', encoding='utf-8', mode='a')
+handler = logging.FileHandler(filename='computer.log', encoding='utf-8', mode='a', delay=True)
 dt_fmt='%Y-%m-%d %H:%M:%S'
 formatter = logging.Formatter('[{asctime}] [{levelname:<8}] {name}: {message}', dt_fmt, style='{')
 handler.setFormatter(formatter)
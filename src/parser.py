@@ -0,0 +1,447 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import bs4
+import discord
+
+from utils import dchyperlink
+
+from .config import PARSER_BACKEND, PARSER_POOL, PARSER_WORKERS
+from .embed import EmbedBuilder
+from .emotes import emoji_for, getQualityFromPath
+from .text import absolute_url, clean_sell_price, collapse_whitespace
+
+# BeautifulSoup tree builders, fastest first. html.parser is pure python and always available.
+BACKENDS = ('lxml', 'html.parser')
+
+
+def available_backends() -> List[str]:
+    available = []
+    for backend in BACKENDS:
+        if backend == 'html.parser':
+            available.append(backend)
+            continue
+        try:
+            __import__(backend)
+        except ImportError:
+            continue
+        available.append(backend)
+    return available
+
+
+def pick_backend(preferred: Optional[str] = PARSER_BACKEND) -> str:
+    """The backend to parse with, ``preferred`` if it is installed, otherwise the fastest one that is."""
+    available = available_backends()
+    if preferred in available:
+        return preferred # type: ignore
+    return available[0]
+
+
+BACKEND = pick_backend()
+
+
+def make_soup(html: str, backend: Optional[str] = None, parse_only: Optional[bs4.SoupStrainer] = None) -> bs4.BeautifulSoup:
+    return bs4.BeautifulSoup(html, backend or BACKEND, parse_only=parse_only)
+
+
+def element_filter(wanted: Callable[[str, dict], bool]) -> bs4.SoupStrainer:
+    """:func:`subtree_strainer` for bs4 4.13 and later, raises ImportError on older versions."""
+    from bs4.filter import ElementFilter
+
+    class SubtreeFilter(ElementFilter):
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            return wanted(name, attrs or {})
+
+        def allow_string_creation(self, string):
+            return False
+
+    return SubtreeFilter() # type: ignore
+
+
+def soup_strainer(wanted: Callable[[str, dict], bool]) -> bs4.SoupStrainer:
+    """:func:`subtree_strainer` for bs4 before 4.13, which calls a function passed as the name with the tag's name and attributes."""
+    return bs4.SoupStrainer(wanted)
+
+
+def subtree_strainer(wanted: Callable[[str, dict], bool]) -> bs4.SoupStrainer:
+    """A strainer keeping only the tags ``wanted(name, attrs)`` accepts, along with everything inside them.
+
+    The rest of the page is thrown away while it is read instead of being built into the tree.
+    """
+    try:
+        return element_filter(wanted)
+    except ImportError:
+        return soup_strainer(wanted)
+
+
+def _classes(attrs: dict) -> List[str]:
+    classes = attrs.get('class') or []
+    return classes.split() if isinstance(classes, str) else list(classes)
+
+
+def _lead_tags(name: str, attrs: dict) -> bool:
+    # all parse_page needs from an infobox page, the thumbnail candidates, title and infobox
+    if name == 'img':
+        return 'srcset' not in attrs
+    if name == 'h1':
+        return attrs.get('id') == 'firstHeading'
+    if name == 'table':
+        return attrs.get('id') == 'infoboxtable'
+    return False
+
+
+def _content_tags(name: str, attrs: dict) -> bool:
+    return name == 'div' and 'mw-parser-output' in _classes(attrs)
+
+
+LEAD_STRAINER = subtree_strainer(_lead_tags)
+CONTENT_STRAINER = subtree_strainer(_content_tags)
+# only pages with this in them are worth straining, see parse_page
+INFOBOX_MARKER = 'id="infoboxtable"'
+
+
+def get_hyperlink_or_text(detail_tag: bs4.element.Tag) -> str:
+    atags = detail_tag.find_all("a")
+    if atags:
+        parts = []
+        for tag in atags:
+            parts.append(dchyperlink(absolute_url(tag["href"]), tag.text).strip())
+            # check tag to ensure there is no text next to it after the hyperlink
+            if tag.next_sibling:
+                parts.append(str(tag.next_sibling))
+        s = "".join(parts)
+
+        # close any unclosed parentheses
+        opened, closed = s.count('('), s.count(')')
+        if opened > closed:
+            s = s.rstrip() + ')'
+        elif opened < closed:
+            s = '(' + s
+    else:
+        s = detail_tag.text
+    return collapse_whitespace(s).strip()
+
+
+def cleanSellPrice(price: str) -> str:
+    return clean_sell_price(price)
+
+
+def has_class(tag: bs4.element.Tag, name: str) -> bool:
+    return name in (tag.get("class") or ())
+
+
+def scan_infobox(infobox: bs4.element.Tag) -> List[Tuple[str, bs4.element.Tag]]:
+    """Walks the infobox once, returning the (section, detail cell) pair of every row that has both.
+
+    Like the old ``tr.find_all`` probes this looks at every row, nested ones included, and
+    pairs each with the first section and detail cell inside it. Rows stop at the first one
+    containing the full width table that starts the infobox's footer.
+    """
+    # tr -> [section cell, detail cell, contains footer table]
+    rows: Dict[int, list] = {}
+    order: List[list] = []
+
+    for tag in infobox.descendants:
+        if not isinstance(tag, bs4.element.Tag):
+            continue
+        if tag.name == "tr":
+            rows[id(tag)] = entry = [None, None, False]
+            order.append(entry)
+            continue
+
+        if tag.name == "td" and tag.get("id") == "infoboxsection":
+            slot = 0
+        elif tag.name == "td" and tag.get("id") == "infoboxdetail":
+            slot = 1
+        elif tag.name == "table" and tag.get("style") == "width:101%;":
+            slot = 2
+        else:
+            continue
+
+        # every row this cell is nested in sees it, the first one found in document order wins
+        for parent in tag.parents:
+            if parent is infobox:
+                break
+            if parent.name == "tr" and (entry := rows.get(id(parent))) is not None:
+                if slot == 2:
+                    entry[2] = True
+                elif entry[slot] is None:
+                    entry[slot] = tag
+
+    pairs = []
+    for section, detail, footer in order:
+        if footer:
+            break
+        if section is None or detail is None:
+            continue
+        section = section.text
+        if section:
+            pairs.append((section, detail))
+    return pairs
+
+
+def table_text(table: bs4.element.Tag, pagename: str) -> str:
+    rows = table.find_all("tr")
+
+    first_row = rows[0]
+
+    text = ""
+    for row in rows:
+        do_newline = True
+        if row.find("tr") is not None:
+            continue
+        tds = row.find_all("td")
+        for i, td in enumerate(tds):
+            # logger.info(f'Found td: {td}')
+
+            backimage = None
+            foreimages = []
+            for div in td.find_all("div"):
+                if backimage is None and has_class(div, "backimage"):
+                    backimage = div
+                if has_class(div, "foreimage"):
+                    foreimages.append(div)
+
+            if backimage is not None:
+                emoji = emoji_for(backimage.find("img")["src"], foreimages, pagename)
+
+                # logger.info(f'Emoji: {emoji}')
+                text += f"{emoji} "
+            inner = td.text.strip()
+            if not inner:
+                continue
+            elif (
+                td.has_attr("style")
+                and "vertical-align: bottom;" in td["style"]
+            ):
+                # logger.info(f'Found td with style: {td["style"]}')
+                text += f"{inner} "
+            elif not td.attrs:
+                # logger.info(f'Found td with no attrs')
+                do_newline = False
+                text += f"{inner} "
+
+            # a cell's children are never empty as far as the old "next td has no attrs and
+            # no children" check was concerned, so only the last cell can drop the newline
+            if i + 1 == len(tds) and row.parent != first_row.parent:
+                do_newline = False
+
+        # logger.info(f'Found row: {row}')
+
+        if do_newline:
+            text += "\n"
+
+    return text
+
+
+def extract_detail(soup: bs4.BeautifulSoup, section: str, detail: bs4.element.Tag, pagename: str) -> str:
+    """Turns an infobox detail cell into field text, classifying the cell in a single walk over it."""
+    table = no_wrap = hidden = None
+    nametemplates = []
+    p_tags = []
+    has_quality = False
+
+    for tag in detail.descendants:
+        if not isinstance(tag, bs4.element.Tag):
+            continue
+        if tag.name == "table":
+            if table is None:
+                table = tag
+        elif tag.name == "span":
+            if no_wrap is None and has_class(tag, "no-wrap"):
+                no_wrap = tag
+            if hidden is None and tag.get("style") == "display: none;":
+                hidden = tag
+            if has_class(tag, "nametemplate"):
+                nametemplates.append(tag)
+        elif tag.name == "p":
+            classes = tag.get("class")
+            if not classes or any(x != "mw-empty-elt" for x in classes):
+                p_tags.append(tag)
+        elif tag.name == "img":
+            if tag.get("alt", "").endswith(" Quality.png"):
+                has_quality = True
+
+    if table is not None and section.strip() != "Sell Price":
+        return table_text(table, pagename)
+    elif no_wrap is not None:
+        return get_hyperlink_or_text(no_wrap)
+    elif hidden is not None:
+        # logger.info(f'Found span: {hidden}')
+        if a := hidden.find("a"):
+            return dchyperlink(absolute_url(a["href"]), detail.text.replace(hidden.text, ""))
+        return detail.text.replace(hidden.text, "")
+    elif nametemplates:
+        return ", ".join(get_hyperlink_or_text(span) for span in nametemplates)
+    elif p_tags:
+        return ", ".join(get_hyperlink_or_text(p) for p in p_tags)
+    elif has_quality:
+        return quality_text(soup, detail)
+
+    #detail = detail.text
+    # maybe a hyperlink?
+    return get_hyperlink_or_text(detail)
+
+
+def quality_text(soup: bs4.BeautifulSoup, detail: bs4.element.Tag) -> str:
+    # getinnerhtml of the detail
+
+    # replace all LOOSE TEXT in the detail with a <loose> tag
+    for child in list(detail.children):
+        if isinstance(child, bs4.element.NavigableString):
+            # child.replace_with(f'<loose>{child}</loose>') will escape the <>
+            # so we have to do this instead
+            child.wrap(soup.new_tag("span"))
+
+    # logger.info(f'Found child: {str(detail.children)}')
+    # extract the img/span pairs
+    # the html is like this:
+    # text, img | text, img | text, img | text
+    pairs = []
+    skip = False
+    for i, child in enumerate(detail.children):
+        if skip:
+            skip = False
+            continue
+        if isinstance(child, bs4.element.Tag):
+            # check if its an img, if it is, get the next child, otherwise set the img inthe aay to none
+            if child.name == "img":
+                img = child.attrs["src"]
+                text = detail.contents[i + 1].text
+
+                # for some reason it has weird escaped unicode
+                text = "".join(
+                    [i if ord(i) < 128 else " " for i in text]
+                ).strip()
+
+                pairs.append((text, img))
+                skip = True
+            else:
+                pairs.append((child.text, None))
+
+    # logger.info(f'Found pairs: {str(pairs)}')
+
+    detail_text = ""
+    for pair in pairs:
+        if pair[1]:
+            detail_text += f"{getQualityFromPath(pair[1])} {pair[0]} "
+        else:
+            detail_text += f"{pair[0]}"
+    return detail_text
+
+
+def parse_page(url: str, html: str, backend: Optional[str] = None, title: Optional[str] = None) -> dict:
+    """Parses a wiki page into the payload of an :class:`EmbedBuilder`.
+
+    ``title`` is for html that isn't a whole page, like the lead section from the api,
+    which has no heading to take the page name from.
+
+    This only touches its arguments, so it can run in a worker thread or process.
+    """
+    embed = EmbedBuilder(fields=[], color=discord.Color.orange())
+
+    # navboxes, sidebars and footers are dropped while parsing, they are most of a big page.
+    # A page without an infobox needs its lead paragraphs, and straining it would mean
+    # reading it twice, which costs more than building all of it once
+    strained = INFOBOX_MARKER in html
+    soup = make_soup(html, backend, parse_only=LEAD_STRAINER if strained else None)
+
+    # find the first <img> that does NOT have a srcset attr
+
+    main_logo_url = "https://stardewvalleywiki.com/mediawiki/images/6/68/Main_Logo.png"
+
+    try:
+
+        embed.thumbnail = (
+            "https://stardewvalleywiki.com"
+            + soup.find_all("img", {"srcset": False})[0]["src"]
+        )
+        if (
+            embed.thumbnail
+            == "https://stardewvalleywiki.com/mediawiki/resources/assets/licenses/cc-by-nc-sa.png"
+        ):
+            embed.image = main_logo_url
+            embed.thumbnail = None
+
+    except Exception:
+        embed.image = main_logo_url
+
+    pagename = title if title is not None else soup.find_all("h1", {"id": "firstHeading"})[0].text
+    embed.title = pagename + " - Stardew Valley Wiki"
+    embed.url = url
+
+    # find all id=infoboxtable > tr that have a infoboxsection and infoboxdetail
+
+    infobox = soup.find("table", {"id": "infoboxtable"})
+
+    # logger.info(f'Found infoboxtable: {infobox}')
+
+    if infobox:
+        for section, detail in scan_infobox(infobox):
+            embed.add_field(section, extract_detail(soup, section, detail, pagename))
+    else:
+        if strained:
+            # the marker was somewhere other than an infobox, so the lead paragraphs are needed after all
+            soup = make_soup(html, backend, parse_only=CONTENT_STRAINER)
+        body = soup.find_all("div", {"class": "mw-parser-output"})[0]
+        #  get the first two <p> tags
+        for p in body.find_all("p")[:2]:
+            embed.description += cleanSellPrice(p.text) + "\n\n"
+    # logger.info(f'Got embed: {embed}')
+    # return embed.build()
+    return embed.to_dict()
+
+
+def timed_parse_page(url: str, html: str, title: Optional[str] = None) -> Tuple[dict, float]:
+    start = time.perf_counter()
+    payload = parse_page(url, html, title=title)
+    return payload, time.perf_counter() - start
+
+
+class ParserPool:
+    """Runs :func:`parse_page` off the event loop, in a pool of threads or processes.
+
+    Keeps track of how many parses are queued and how long they take, for ``bothealth``.
+    """
+
+    def __init__(self, kind: str = PARSER_POOL, workers: int = PARSER_WORKERS):
+        self.kind = kind
+        self.workers = workers
+        self.executor: Executor
+        if kind == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='wiki-parser')
+        self.pending = 0
+        self.parsed = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def parse(self, url: str, html: str, title: Optional[str] = None) -> dict:
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        try:
+            payload, elapsed = await loop.run_in_executor(self.executor, timed_parse_page, url, html, title)
+        finally:
+            self.pending -= 1
+
+        self.parsed += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        return payload
+
+    def stats(self) -> dict:
+        return {
+            'kind': self.kind,
+            'backend': BACKEND,
+            'workers': self.workers,
+            'pending': self.pending,
+            'parsed': self.parsed,
+            'average': self.total_time / self.parsed if self.parsed else 0.0,
+            'max': self.max_time,
+        }
@@ -0,0 +1,118 @@
+import datetime
+import json
+import os
+import time
+from typing import IO, List, Optional
+
+
+def _encode(obj):
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+class Spool:
+    """Append-only JSON lines file that rows are written to before they are acknowledged.
+
+    Rows go to the active file at ``path``. Whenever a batch is handed to the database the
+    active file is rotated into a numbered segment, which is deleted once the batch is
+    written and replayed later if it isn't. A segment the database rejects is set aside with a
+    ``.failed`` suffix. Past ``max_bytes`` the set aside segments are dropped first, then the
+    waiting ones, oldest first.
+
+    Every method is blocking, but appends are a single small write.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._file: Optional[IO[str]] = None
+        # whatever a crash left in the active file becomes a segment to replay
+        self.rotate()
+
+    def append(self, row: dict) -> None:
+        assert self._file is not None
+        self._file.write(json.dumps(row, default=_encode) + '\n')
+        # out of our buffers and into the OS, so it survives the process dying
+        self._file.flush()
+
+    def rotate(self) -> Optional[str]:
+        """Closes off the active file as a segment and starts a new one, returning the segment if there was anything in it."""
+        if self._file is not None:
+            self._file.close()
+
+        segment = None
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            segment = f'{self.path}.{time.time_ns():020d}'
+            os.replace(self.path, segment)
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._enforce_limit()
+        return segment
+
+    def segments(self) -> List[str]:
+        """Segments waiting to be written, oldest first."""
+        return self._list_segments('')
+
+    def failed_segments(self) -> List[str]:
+        """Segments set aside by :meth:`set_aside`, oldest first."""
+        return self._list_segments('.failed')
+
+    def set_aside(self, segment: str) -> str:
+        """Moves a segment that can't be written out of the replay queue, it still counts towards ``max_bytes``."""
+        failed = f'{segment}.failed'
+        os.replace(segment, failed)
+        return failed
+
+    def read(self, segment: str) -> List[dict]:
+        rows = []
+        with open(segment, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # a line cut short by a crash
+                    continue
+        return rows
+
+    def remove(self, segment: str) -> None:
+        try:
+            os.remove(segment)
+        except FileNotFoundError:
+            pass
+
+    def size(self) -> int:
+        total = 0
+        for path in (self.path, *self.failed_segments(), *self.segments()):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _list_segments(self, suffix: str) -> List[str]:
+        directory, name = os.path.split(self.path)
+        prefix = f'{name}.'
+        return sorted(
+            os.path.join(directory, entry)
+            for entry in os.listdir(directory or '.')
+            if entry.startswith(prefix) and entry.endswith(suffix) and entry[len(prefix):len(entry) - len(suffix)].isdigit()
+        )
+
+    def _enforce_limit(self) -> None:
+        # nothing replays the set aside segments, so they go before any that are still waiting
+        segments = self.failed_segments() + self.segments()
+        sizes = {segment: os.path.getsize(segment) for segment in segments}
+        total = sum(sizes.values())
+        while segments and total > self.max_bytes:
+            oldest = segments.pop(0)
+            with open(oldest, 'r', encoding='utf-8') as f:
+                self.dropped += sum(1 for _ in f)
+            self.remove(oldest)
+            total -= sizes[oldest]
@@ -0,0 +1,99 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+
+class StoredPage:
+    __slots__ = ('url', 'payload', 'etag', 'last_modified', 'stored_at')
+
+    def __init__(
+        self,
+        url: str,
+        payload: dict,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        stored_at: Optional[float] = None,
+    ):
+        self.url = url
+        self.payload = payload
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+
+class PageStore:
+    """SQLite backed store for parsed wiki pages, so the page cache survives restarts.
+
+    Every method is blocking; call them through ``asyncio.to_thread``.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                '''CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL NOT NULL
+                )'''
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS pages_stored_at ON pages (stored_at)')
+            self._conn.execute(
+                '''CREATE TABLE IF NOT EXISTS aliases (
+                    alias TEXT PRIMARY KEY,
+                    url TEXT NOT NULL
+                )'''
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def load(self, limit: int) -> Tuple[List[StoredPage], List[Tuple[str, str]]]:
+        """Returns the ``limit`` most recently stored pages and the aliases pointing at them."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url, payload, etag, last_modified, stored_at FROM pages ORDER BY stored_at DESC LIMIT ?',
+                (limit,),
+            ).fetchall()
+            aliases = self._conn.execute('SELECT alias, url FROM aliases').fetchall()
+
+        pages = [StoredPage(url, json.loads(payload), etag, last_modified, stored_at) for url, payload, etag, last_modified, stored_at in rows]
+        return pages, aliases
+
+    def put(self, page: StoredPage, aliases: Iterable[str] = ()) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages (url, payload, etag, last_modified, stored_at) VALUES (?, ?, ?, ?, ?)',
+                (page.url, json.dumps(page.payload), page.etag, page.last_modified, page.stored_at),
+            )
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO aliases (alias, url) VALUES (?, ?)',
+                [(alias, page.url) for alias in aliases],
+            )
+            self._prune()
+
+    def touch(self, url: str, stored_at: Optional[float] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE pages SET stored_at = ? WHERE url = ?', (time.time() if stored_at is None else stored_at, url))
+
+    def delete(self, url: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM pages WHERE url = ?', (url,))
+            self._conn.execute('DELETE FROM aliases WHERE url = ?', (url,))
+
+    def _prune(self) -> None:
+        # keep the file bounded, dropping the pages that were refreshed longest ago
+        self._conn.execute(
+            'DELETE FROM pages WHERE url NOT IN (SELECT url FROM pages ORDER BY stored_at DESC LIMIT ?)',
+            (self.max_entries,),
+        )
+        self._conn.execute('DELETE FROM aliases WHERE url NOT IN (SELECT url FROM pages)')
@@ -0,0 +1,59 @@
+from functools import lru_cache
+import re
+from typing import List
+import urllib.parse
+
+from .config import WIKI_URL
+
+# compiled once here instead of from a string on every call
+SORT_VALUE_RE = re.compile(r'data-sort-value="[a-zA-Z0-9-_ ]+"')
+SPACE_RUN_RE = re.compile(r' {2,}')
+# [[wikitext]] style links in chat messages, non greedy so several links in one message match separately
+LINK_RE = re.compile(r'\[\[(.+?)\]\]')
+# a [[link]](url) is a markdown link that happens to use brackets, not a wiki link
+BAD_LINK_RE = re.compile(r'\[\[.+\]\]\(.+\)')
+OLD_WIKI_LINK_RE = re.compile(r"https://stardewcommunitywiki\.com/[a-zA-Z0-9_/:\-%]*")
+# longest message discord accepts
+MESSAGE_LIMIT = 2000
+
+
+def collapse_whitespace(text: str) -> str:
+    """Squashes runs of spaces, tabs and non-breaking spaces into one space and drops newlines."""
+    text = text.replace('\t', ' ').replace('\xa0', ' ')
+    # most cells have no runs at all, and the plain replaces are far cheaper than a regex pass
+    if '  ' in text:
+        text = SPACE_RUN_RE.sub(' ', text)
+    return text.replace('\n', '')
+
+
+def clean_sell_price(price: str) -> str:
+    return SORT_VALUE_RE.sub("", price)
+
+
+@lru_cache(maxsize=4096)
+def absolute_url(href: str) -> str:
+    """``href`` resolved against the wiki, the same few hundred links show up on every page."""
+    return urllib.parse.urljoin(WIKI_URL, href)
+
+
+def link_target(link: str) -> str:
+    """The page a ``[[link]]`` points at, without its ``|label`` or ``#section``."""
+    return link.split('|', 1)[0].split('#', 1)[0].strip()
+
+
+def split_message(lines: List[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Joins ``lines`` with newlines into as few messages of at most ``limit`` characters as it can.
+
+    Lines are never split, each one has to fit in a message on its own.
+    """
+    messages: List[str] = []
+    current = ''
+    for line in lines:
+        if current and len(current) + 1 + len(line) > limit:
+            messages.append(current)
+            current = line
+        else:
+            current = f'{current}\n{line}' if current else line
+    if current:
+        messages.append(current)
+    return messages
@@ -0,0 +1,159 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def normalise_title(title: str) -> str:
+    """Case and whitespace insensitive form of a wiki title, underscores count as spaces."""
+    return ' '.join(title.replace('_', ' ').split()).casefold()
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance between ``a`` and ``b``, giving up with ``limit + 1`` once it is over ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TitleIndex:
+    """Lookup structures over the wiki's page titles.
+
+    Built once whenever the title list is refreshed, so exact lookups are a dict hit
+    and autocomplete is a couple of binary searches instead of a scan over every title.
+    Misspelt queries are matched through a trigram index and ranked by edit distance.
+    """
+
+    def __init__(self, titles: Iterable[str] = ()):
+        # dict.fromkeys drops duplicates but keeps the wiki's ordering
+        self.titles: List[str] = list(dict.fromkeys(titles))
+        self._exact: Dict[str, str] = {}
+        self._keys: List[str] = []
+        self._trigrams: Dict[str, List[int]] = defaultdict(list)
+        words: List[Tuple[str, str, bool]] = []
+
+        for n, title in enumerate(self.titles):
+            key = normalise_title(title)
+            self._exact.setdefault(key, title)
+            self._keys.append(key)
+            for gram in trigrams(key):
+                self._trigrams[gram].append(n)
+            # every suffix starting at a word boundary, so "shard" finds "Prismatic Shard"
+            start = 0
+            while start != -1:
+                words.append((key[start:], title, start == 0))
+                start = key.find(' ', start)
+                if start != -1:
+                    start += 1
+
+        words.sort()
+        self._word_keys = [key for key, _, _ in words]
+        self._word_titles = [title for _, title, _ in words]
+        self._word_is_start = [is_start for _, _, is_start in words]
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def __contains__(self, title: str) -> bool:
+        return normalise_title(title) in self._exact
+
+    def resolve(self, query: str) -> Optional[str]:
+        """Returns the title ``query`` refers to, ignoring case and whitespace, or None."""
+        return self._exact.get(normalise_title(query))
+
+    def complete(self, current: str, limit: int = 25) -> List[str]:
+        """Titles to suggest for ``current``, titles starting with it first, then titles with a word starting with it."""
+        key = normalise_title(current)
+        if not key:
+            return self.titles[:limit]
+
+        prefix: List[str] = []
+        word: List[str] = []
+        seen = set()
+        i = bisect_left(self._word_keys, key)
+        while i < len(self._word_keys) and len(prefix) < limit and self._word_keys[i].startswith(key):
+            title = self._word_titles[i]
+            if self._word_is_start[i]:
+                prefix.append(title)
+            elif title not in seen:
+                word.append(title)
+            seen.add(title)
+            i += 1
+
+        matches = list(dict.fromkeys(prefix + word))[:limit]
+        if len(matches) < limit and len(key) >= 3:
+            # nothing close enough by prefix, so offer what they probably meant
+            for title in self.fuzzy(current, limit=limit, prefix=True):
+                if title not in matches:
+                    matches.append(title)
+        return matches[:limit]
+
+    def fuzzy(self, query: str, limit: int = 5, candidates: int = 50, prefix: bool = False) -> List[str]:
+        """Titles closest to ``query``, best first.
+
+        Titles sharing the most trigrams with the query are shortlisted, then ranked by edit distance.
+        With ``prefix`` the query is compared against the start of each title, for half typed queries.
+        """
+        key = normalise_title(query)
+        grams = trigrams(key)
+        overlap: Counter = Counter()
+        for gram in grams:
+            overlap.update(self._trigrams.get(gram, ()))
+        if not overlap:
+            return []
+
+        ranked = []
+        for n, shared in overlap.most_common(candidates):
+            other = self._keys[n][:len(key)] if prefix else self._keys[n]
+            distance = edit_distance(key, other, limit=len(key))
+            ranked.append((distance, -shared, n))
+        ranked.sort()
+        return [self.titles[n] for _, _, n in ranked[:limit]]
+
+    def closest(self, query: str) -> Optional[str]:
+        """The title ``query`` is most likely a typo of, or None if nothing is close enough to be sure."""
+        key = normalise_title(query)
+        if len(key) < 4:
+            return None
+        # roughly one typo for every five characters
+        allowed = max(1, len(key) // 5)
+        for title in self.fuzzy(query, limit=1):
+            if edit_distance(key, normalise_title(title), limit=allowed) <= allowed:
+                return title
+        return None
+
+
+def load_titles(path: str) -> Tuple[List[str], Optional[str]]:
+    """Reads a title list saved by :func:`save_titles`, returning it with the wiki timestamp it is current as of."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return [], None
+    return list(data.get('titles', [])), data.get('timestamp')
+
+
+def save_titles(path: str, titles: List[str], timestamp: str) -> None:
+    # written next to the old file and renamed over it, so a crash never leaves half a list behind
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': timestamp, 'titles': titles}, f)
+    os.replace(tmp, path)
@@ -0,0 +1,105 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, TypeVar
+
+import pytest
+
+from src import emotes, logger, parser
+
+from .fakewiki import FakeWiki
+
+T = TypeVar('T')
+
+# hyperlinks and emojis come from the utils submodule, they are pinned here so the
+# golden payloads only change when the parser does
+PINNED_EMOJIS = {
+    name: f':{name}:'
+    for name in (
+        *emotes.QUALITY_STARS.values(),
+        *emotes.HEALTH_ENERGY_POISON.values(),
+        *emotes.QUALITY_HEALTH_ENERGY_POISON.values(),
+        'coin',
+    )
+}
+
+
+def pinned_hyperlink(url: str, text: str) -> str:
+    return f'[{text}]({url})'
+
+
+@pytest.fixture(autouse=True, scope='session')
+def log_file(tmp_path_factory):
+    # the bot's log file opens on the first record, keep the records from test runs out of the checkout
+    logger.handler.baseFilename = str(tmp_path_factory.mktemp('logs') / 'computer.log')
+
+
+@pytest.fixture(autouse=True)
+def pinned_utils(monkeypatch):
+    monkeypatch.setattr(parser, 'dchyperlink', pinned_hyperlink)
+    monkeypatch.setattr(emotes, 'emojidict', PINNED_EMOJIS)
+
+
+class FakeBot:
+    """Just enough of the bot for the wiki cog and its cache, which find each other through it."""
+
+    def __init__(self):
+        self.cogs: Dict[str, object] = {}
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+
+@pytest.fixture
+def store_path(tmp_path) -> str:
+    return os.path.join(tmp_path, 'wiki_cache.sqlite3')
+
+
+@pytest.fixture
+def loaded_cogs() -> List[object]:
+    return []
+
+
+@pytest.fixture
+def make_cog(monkeypatch, store_path, loaded_cogs):
+    """Builds the wiki cog pointed at a :class:`~tests.fakewiki.FakeWiki`, with its page cache in a temporary file.
+
+    Call it from inside the event loop, the cog starts its background tasks straight away.
+    """
+    from cogs import commands
+    from src import cache
+
+    monkeypatch.setattr(cache, 'CACHE_STORE_PATH', store_path)
+
+    def make(url: str, backend: str = 'html'):
+        monkeypatch.setattr(commands, 'WIKI_URL', url)
+        monkeypatch.setattr(commands, 'WIKI_API_URL', f'{url}/mediawiki/api.php')
+        monkeypatch.setattr(commands, 'WIKI_BACKEND', backend)
+        bot = FakeBot()
+        cog = commands.CommandsCog(bot) # type: ignore
+        bot.cogs[cog.qualified_name] = cog
+        loaded_cogs.append(cog)
+        return cog
+
+    return make
+
+
+@pytest.fixture
+def run_wiki(loaded_cogs) -> Callable[[FakeWiki, Callable[[str], Awaitable[T]]], T]:
+    """Serves ``wiki`` and runs ``scenario(url)`` against it in a fresh event loop, returning what it returns.
+
+    Afterwards every cog ``make_cog`` built that is still loaded is unloaded, and the wiki is shut down.
+    """
+    def run(wiki: FakeWiki, scenario: Callable[[str], Awaitable[T]]) -> T:
+        async def main() -> T:
+            url = await wiki.start()
+            try:
+                return await scenario(url)
+            finally:
+                for cog in loaded_cogs:
+                    if not cog.session.closed: # type: ignore
+                        await cog.cog_unload() # type: ignore
+                await wiki.close()
+
+        return asyncio.run(main())
+
+    return run
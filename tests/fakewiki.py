@@ -0,0 +1,156 @@
+import json
+import os
+from typing import Dict, List, Optional
+import urllib.parse
+
+from aiohttp import web
+import bs4
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_page(name: str) -> str:
+    with open(os.path.join(FIXTURES, 'pages', f'{name}.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+def title_from_path(path: str) -> str:
+    title = urllib.parse.unquote(path.lstrip('/')).replace('_', ' ')
+    return title[:1].upper() + title[1:]
+
+
+class FakeWiki:
+    """A local stand-in for the wiki, serving saved pages over http.
+
+    Pages, searches and the parts of the MediaWiki api the cog uses are answered from
+    ``pages``, and every request is recorded in ``requests`` so tests can count them.
+    """
+
+    def __init__(self, pages: Dict[str, str]):
+        # title -> html of the whole page
+        self.pages = dict(pages)
+        # title -> title it redirects to
+        self.redirects: Dict[str, str] = {}
+        self.revisions = {title: 1 for title in self.pages}
+        # entries list=recentchanges answers with, as the wiki would send them
+        self.recent_changes: List[dict] = []
+        self.requests: List[str] = []
+        self.url = ''
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/mediawiki/api.php', self.api)
+        app.router.add_get('/mediawiki/index.php', self.index)
+        app.router.add_get('/{title:.+}', self.page)
+        app.middlewares.append(self.record)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1] # type: ignore
+        self.url = f'http://127.0.0.1:{port}'
+        return self.url
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def edit(self, title: str, html: str) -> None:
+        self.pages[title] = html
+        self.revisions[title] = self.revisions.get(title, 0) + 1
+
+    def delete(self, title: str) -> None:
+        self.pages.pop(title, None)
+        self.revisions.pop(title, None)
+
+    def resolve(self, title: str) -> Optional[str]:
+        title = title_from_path(title)
+        title = self.redirects.get(title, title)
+        return title if title in self.pages else None
+
+    @web.middleware
+    async def record(self, request: web.Request, handler):
+        self.requests.append(request.path_qs)
+        return await handler(request)
+
+    def etag(self, title: str) -> str:
+        return f'"rev-{self.revisions[title]}"'
+
+    async def page(self, request: web.Request) -> web.StreamResponse:
+        requested = title_from_path(request.match_info['title'])
+        if requested in self.redirects:
+            raise web.HTTPMovedPermanently(f"/{self.redirects[requested].replace(' ', '_')}")
+        if requested not in self.pages:
+            return web.Response(status=404, text='<html><body><p>There is currently no text in this page.</p></body></html>', content_type='text/html')
+
+        etag = self.etag(requested)
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(text=self.pages[requested], content_type='text/html', headers={'ETag': etag})
+
+    async def index(self, request: web.Request) -> web.StreamResponse:
+        search = request.query.get('search', '').replace('+', ' ')
+        if (title := self.resolve(search)) is not None:
+            # like mediawiki, an exact match goes straight to the article
+            raise web.HTTPFound(f"/{title.replace(' ', '_')}")
+
+        results = [title for title in self.pages if search.lower() in title.lower()]
+        items = ''.join(
+            f'<li class="mw-search-result"><div class="mw-search-result-heading"><a href="/{title.replace(" ", "_")}" title="{title}">{title}</a></div></li>'
+            for title in results
+        )
+        body = f'<ul class="mw-search-results">{items}</ul>' if items else '<p class="mw-search-nonefound">There were no results matching the query.</p>'
+        return web.Response(text=f'<html><body><div class="searchresults">{body}</div></body></html>', content_type='text/html')
+
+    def lead_section(self, title: str) -> str:
+        soup = bs4.BeautifulSoup(self.pages[title], 'html.parser')
+        content = soup.find('div', {'class': 'mw-parser-output'})
+        # the api leaves out everything from the first heading on
+        for heading in content.find_all('h2'): # type: ignore
+            for sibling in list(heading.find_next_siblings()):
+                sibling.extract()
+            heading.extract()
+        return str(content)
+
+    async def api(self, request: web.Request) -> web.StreamResponse:
+        params = request.query
+        action = params.get('action')
+
+        if action == 'parse':
+            title = self.resolve(params['page'])
+            if title is None:
+                data: dict = {'error': {'code': 'missingtitle', 'info': "The page you specified doesn't exist."}}
+            else:
+                data = {'parse': {'title': title, 'revid': self.revisions[title], 'text': self.lead_section(title)}}
+
+        elif action == 'query' and params.get('list') == 'search':
+            needle = params['srsearch'].lower()
+            data = {'query': {'search': [{'title': title} for title in self.pages if needle in title.lower()][:int(params.get('srlimit', 10))]}}
+
+        elif action == 'query' and params.get('list') == 'recentchanges':
+            data = {'query': {'recentchanges': self.recent_changes}}
+
+        elif action == 'query' and 'titles' in params:
+            query: dict = {'normalized': [], 'redirects': [], 'pages': []}
+            for title in params['titles'].split('|'):
+                normalised = title_from_path(title.replace(' ', '_'))
+                if normalised != title:
+                    query['normalized'].append({'from': title, 'to': normalised})
+                if normalised in self.redirects:
+                    query['redirects'].append({'from': normalised, 'to': self.redirects[normalised]})
+                    normalised = self.redirects[normalised]
+                if normalised in self.pages:
+                    page: dict = {'title': normalised}
+                    if params.get('prop') == 'revisions':
+                        page['revisions'] = [{'revid': self.revisions[normalised]}]
+                    query['pages'].append(page)
+                else:
+                    query['pages'].append({'title': normalised, 'missing': True})
+            data = {'query': query}
+
+        else:
+            data = {'error': {'code': 'badvalue', 'info': f'Unhandled request {dict(params)}'}}
+
+        return web.Response(text=json.dumps(data), content_type='application/json')
@@ -0,0 +1,150 @@
+import json
+import os
+import time
+from typing import List
+import urllib.parse
+
+from src.cache import normalise_url
+
+from .fakewiki import FIXTURES, FakeWiki, load_page
+
+
+def golden(name: str) -> dict:
+    with open(os.path.join(FIXTURES, 'golden', f'{name}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def api_calls(wiki: FakeWiki) -> List[str]:
+    """The api requests the wiki got, as ``action`` or ``action:list/prop``."""
+    calls = []
+    for path in wiki.requests:
+        parts = urllib.parse.urlsplit(path)
+        assert parts.path == '/mediawiki/api.php', f'{path} is not an api request'
+        params = dict(urllib.parse.parse_qsl(parts.query))
+        kind = params.get('list') or params.get('prop')
+        calls.append(f"{params['action']}:{kind}" if params['action'] == 'query' else params['action'])
+    return calls
+
+
+def test_existing_page_is_one_request(make_cog, run_wiki):
+    wiki = FakeWiki({'Parsnip': load_page('parsnip')})
+
+    async def scenario(url):
+        cog = make_cog(url, backend='api')
+        emb = await cog.search('Parsnip')
+
+        assert api_calls(wiki) == ['parse']
+        # the lead section carries the whole infobox, so the fields match the scraped page
+        assert emb.title == golden('parsnip')['title']
+        assert [field.name for field in emb.fields] == [field['name'] for field in golden('parsnip')['fields']]
+        assert [field.value for field in emb.fields] == [field['value'] for field in golden('parsnip')['fields']]
+        assert emb.url == f'{url}/Parsnip'
+
+    run_wiki(wiki, scenario)
+
+
+def test_redirect_is_followed_by_the_api(make_cog, run_wiki):
+    wiki = FakeWiki({'Parsnip': load_page('parsnip')})
+    wiki.redirects['Parsnips'] = 'Parsnip'
+
+    async def scenario(url):
+        cog = make_cog(url, backend='api')
+        emb = await cog.search('Parsnips')
+        # cached under the article and the redirect both
+        again = await cog.search('Parsnip')
+
+        assert api_calls(wiki) == ['parse']
+        assert emb.url == again.url == f'{url}/Parsnip'
+
+    run_wiki(wiki, scenario)
+
+
+def test_search_finds_the_closest_page(make_cog, run_wiki):
+    wiki = FakeWiki({'Parsnip': load_page('parsnip'), 'Abigail': load_page('abigail')})
+
+    async def scenario(url):
+        cog = make_cog(url, backend='api')
+        emb = await cog.search('Parsni')
+
+        assert api_calls(wiki) == ['parse', 'query:search', 'parse']
+        assert emb.title == 'Parsnip - Stardew Valley Wiki'
+
+    run_wiki(wiki, scenario)
+
+
+def test_revalidation_compares_revisions(make_cog, run_wiki):
+    wiki = FakeWiki({'Catfish': load_page('catfish')})
+
+    async def scenario(url):
+        cog = make_cog(url, backend='api')
+        key = normalise_url(f'{url}/Catfish')
+        first = await cog.search('Catfish')
+
+        cog.cache.pages.refresh(key, time.time() - cog.cache.pages.ttl - 60)
+        unchanged = await cog.cache.revalidate(key)
+        assert api_calls(wiki) == ['parse', 'query:revisions']
+
+        wiki.edit('Catfish', load_page('catfish').replace('6am - 12am', '6am - 2am'))
+        cog.cache.pages.refresh(key, time.time() - cog.cache.pages.ttl - 60)
+        edited = await cog.cache.revalidate(key)
+
+        assert api_calls(wiki) == ['parse', 'query:revisions', 'query:revisions', 'parse']
+        assert cog.cache.revalidated == 1
+        assert unchanged.to_dict() == first.to_dict()
+        assert {field.name: field.value for field in edited.fields}['Time'] == '6am - 2am'
+
+    run_wiki(wiki, scenario)
+
+
+def test_recent_changes_are_applied_to_the_titles(make_cog, run_wiki):
+    wiki = FakeWiki({})
+    wiki.recent_changes = [
+        {'type': 'new', 'title': 'Mango'},
+        {'type': 'new', 'title': 'Mangos', 'redirect': True},
+        {'type': 'log', 'logtype': 'delete', 'logaction': 'delete', 'title': 'Parsnip'},
+        {'type': 'log', 'logtype': 'delete', 'logaction': 'delete_redir', 'title': 'Parsnips'},
+        # hides one edit or log line, the pages themselves are still there
+        {'type': 'log', 'logtype': 'delete', 'logaction': 'revision', 'title': 'Abigail'},
+        {'type': 'log', 'logtype': 'delete', 'logaction': 'event', 'title': 'Catfish'},
+        {'type': 'log', 'logtype': 'delete', 'logaction': 'restore', 'title': 'Farm'},
+        {'type': 'log', 'logtype': 'move', 'title': 'Festivals', 'logparams': {'target_ns': 0, 'target_title': 'Festival'}},
+    ]
+
+    async def scenario(url):
+        cog = make_cog(url, backend='api')
+        return await cog.recent_title_changes(['Abigail', 'Catfish', 'Festivals', 'Parsnip', 'Parsnips'], '2024-01-01T00:00:00Z')
+
+    assert run_wiki(wiki, scenario) == ['Abigail', 'Catfish', 'Farm', 'Festival', 'Mango']
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+        self.author = object()
+        self.replies: List[str] = []
+
+    async def reply(self, content: str, **kwargs) -> None:
+        self.replies.append(content)
+
+
+def test_many_links_are_split_over_replies(make_cog, run_wiki, monkeypatch):
+    from cogs import commands
+
+    monkeypatch.setattr(commands, 'WIKITEXT_LINKING', True)
+    monkeypatch.setattr(commands, 'OLD_WIKI_REDIRECT', False)
+    titles = [f'Long Enough Page Title Number {n}' for n in range(60)]
+    wiki = FakeWiki({title: load_page('parsnip') for title in titles})
+    # piped and section links point at the page, not at a title with a | or # in it
+    message = FakeMessage(' '.join(f'[[{title}|page {n}]] [[{title}#Seeds]]' for n, title in enumerate(titles)))
+
+    async def scenario(url):
+        cog = make_cog(url, backend='api')
+        cog.bot.user = object()
+        await cog.on_message(message)
+        assert not any(cog.cache.is_missing(title) for title in titles)
+        return url
+
+    url = run_wiki(wiki, scenario)
+    assert len(message.replies) > 1
+    assert all(len(reply) <= 2000 for reply in message.replies)
+    assert '\n'.join(message.replies).split('\n') == [f'<{url}/{title.replace(" ", "_")}>' for title in titles]
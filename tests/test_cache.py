@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+from src.cache import normalise_url
+
+from .fakewiki import FakeWiki, load_page
+
+
+def wiki_with(*names: str) -> FakeWiki:
+    return FakeWiki({name.title(): load_page(name) for name in names})
+
+
+def test_pages_survive_a_restart(make_cog, run_wiki):
+    wiki = wiki_with('parsnip', 'abigail')
+
+    async def scenario(url):
+        cog = make_cog(url)
+        first = await cog.search('Parsnip')
+        assert first.title == 'Parsnip - Stardew Valley Wiki'
+        assert wiki.requests == ['/Parsnip']
+        await cog.cog_unload()
+
+        cog = make_cog(url)
+        await cog.cache.load()
+        assert len(cog.cache.pages) == 1
+        second = await cog.search('Parsnip')
+
+        # served from disk, the wiki never saw a second request
+        assert wiki.requests == ['/Parsnip']
+        assert second.to_dict() == first.to_dict()
+
+    run_wiki(wiki, scenario)
+
+
+def test_aliases_survive_a_restart(make_cog, run_wiki):
+    wiki = wiki_with('parsnip')
+    wiki.redirects['Parsnips'] = 'Parsnip'
+
+    async def scenario(url):
+        cog = make_cog(url)
+        first = await cog.search('Parsnips')
+        await cog.cog_unload()
+        assert wiki.requests == ['/Parsnips', '/Parsnip']
+
+        cog = make_cog(url)
+        await cog.cache.load()
+        second = await cog.search('Parsnips')
+        direct = await cog.search('Parsnip')
+
+        assert wiki.requests == ['/Parsnips', '/Parsnip']
+        assert second.to_dict() == direct.to_dict() == first.to_dict()
+
+    run_wiki(wiki, scenario)
+
+
+def test_expired_pages_are_not_loaded(make_cog, run_wiki):
+    wiki = wiki_with('parsnip', 'abigail')
+
+    async def scenario(url):
+        cog = make_cog(url)
+        await cog.search('Parsnip')
+        await cog.search('Abigail')
+        # stored long enough ago that it is past even the stale window
+        pages = cog.cache.pages
+        await asyncio.to_thread(cog.cache.store.touch, normalise_url(f'{url}/Parsnip'), time.time() - pages.ttl - pages.stale_ttl - 60)
+        await cog.cog_unload()
+
+        cog = make_cog(url)
+        await cog.cache.load()
+        loaded = list(cog.cache.pages.keys())
+        await cog.search('Parsnip')
+
+        assert loaded == [normalise_url(f'{url}/Abigail')]
+        assert wiki.requests == ['/Parsnip', '/Abigail', '/Parsnip']
+
+    run_wiki(wiki, scenario)
+
+
+def test_search_result_is_fetched_once(make_cog, run_wiki):
+    wiki = wiki_with('parsnip')
+
+    async def scenario(url):
+        cog = make_cog(url)
+        emb = await cog.search('Parsni')
+        stats = cog.cache.stats()
+
+        assert emb.title == 'Parsnip - Stardew Valley Wiki'
+        # the article, the search page and the result, the result body goes straight to the parser
+        assert wiki.requests == ['/Parsni', '/mediawiki/index.php?search=Parsni', '/Parsnip']
+        assert (stats['hits'], stats['misses']) == (0, 1)
+
+    run_wiki(wiki, scenario)
+
+
+def expire(cog, url: str) -> None:
+    # past its ttl but still kept around to be revalidated
+    cog.cache.pages.refresh(normalise_url(url), time.time() - cog.cache.pages.ttl - 60)
+
+
+def test_unmodified_page_is_revalidated(make_cog, run_wiki):
+    wiki = wiki_with('parsnip')
+
+    async def scenario(url):
+        cog = make_cog(url)
+        first = await cog.search('Parsnip')
+        expire(cog, f'{url}/Parsnip')
+        second = await cog.cache.revalidate(f'{url}/Parsnip')
+
+        assert wiki.requests == ['/Parsnip', '/Parsnip']
+        assert cog.cache.revalidated == 1
+        assert second.to_dict() == first.to_dict()
+
+    run_wiki(wiki, scenario)
+
+
+def test_deleted_page_is_dropped_from_disk(make_cog, run_wiki):
+    wiki = wiki_with('parsnip', 'abigail')
+
+    async def scenario(url):
+        cog = make_cog(url)
+        await cog.search('Parsnip')
+        await cog.search('Abigail')
+        expire(cog, f'{url}/Parsnip')
+        wiki.delete('Parsnip')
+        assert await cog.cache.revalidate(f'{url}/Parsnip') is None
+        await cog.cog_unload()
+
+        cog = make_cog(url)
+        await cog.cache.load()
+        assert list(cog.cache.pages.keys()) == [normalise_url(f'{url}/Abigail')]
+
+    run_wiki(wiki, scenario)
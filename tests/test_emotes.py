@@ -0,0 +1,97 @@
+from itertools import product
+
+import bs4
+import pytest
+
+from src import emotes
+
+from .conftest import PINNED_EMOJIS
+
+ICONS = '/mediawiki/images/{}'
+# every icon the table knows, a file it doesn't and one that only nearly matches
+PATHS = [ICONS.format(name) for name in emotes.ICON_NAMES] + [ICONS.format('Parsnip.png'), ICONS.format('Gold_Quality_Icon.png.webp')]
+
+
+def old_identify(path, pagename=None, foreimages=None):
+    # the endswith chains emoji_for replaced, with the finally in qualityHealthEnergyPoison
+    # that threw every result away taken out
+    emojidict = emotes.emojidict
+
+    def getQualityFromPath(path):
+        if path.endswith('Iridium_Quality.png'):
+            return emojidict.get("iridium")
+        elif path.endswith('Gold_Quality.png'):
+            return emojidict.get("gold")
+        elif path.endswith('Silver_Quality.png'):
+            return emojidict.get("silver")
+        return None
+
+    def getHealthEnergyPoisonFromPath(path):
+        if path.endswith('Health.png'):
+            return emojidict.get("20pxHealth")
+        elif path.endswith('Energy.png'):
+            return emojidict.get("20pxEnergy")
+        elif path.endswith('Poison.png'):
+            return emojidict.get("POISON")
+        return None
+
+    def checkIfShouldBeGoldCoin(foreimages):
+        try:
+            path = foreimages[0].find_all('img')[0]['src']
+            return emojidict.get("coin") if path.endswith('Gold_Quality_Icon.png') else None
+        except Exception:
+            return None
+
+    def qualityHealthEnergyPoison(back_path, foreimages):
+        try:
+            imgs = foreimages[0].find_all('img')
+            if not len(imgs) > 0:
+                return None
+            fore_path = imgs[0]['src']
+            for quality in ('Silver', 'Gold', 'Iridium'):
+                if fore_path.endswith(f'{quality}_Quality_Icon.png'):
+                    for kind in ('Health', 'Energy', 'Poison'):
+                        if back_path.endswith(f'{kind}.png'):
+                            return emojidict.get(f'{quality.upper()}_{kind.upper()}')
+                    return None
+        except Exception:
+            return None
+        return None
+
+    if q := getQualityFromPath(path):
+        return q
+    elif (q := qualityHealthEnergyPoison(path, foreimages)) and len(foreimages) > 0:
+        return q
+    elif h := getHealthEnergyPoisonFromPath(path):
+        return h
+    elif (g := checkIfShouldBeGoldCoin(foreimages)) and len(foreimages) > 0 and pagename:
+        return g
+    return None
+
+
+def foreground(path):
+    """The foreground divs of an infobox cell drawing ``path``, none for None and one without an img for ''."""
+    if path is None:
+        return []
+    soup = bs4.BeautifulSoup(f'<div><span><img src="{path}"></span></div>' if path else '<div></div>', 'html.parser')
+    return soup.find_all('div')
+
+
+@pytest.mark.parametrize('pagename', [None, 'Parsnip'])
+@pytest.mark.parametrize('emojis', ['all', 'no quality overlays'])
+def test_matches_the_endswith_chain(monkeypatch, pagename, emojis):
+    if emojis != 'all':
+        # a missing emoji falls through to the next candidate, as it did before the table
+        monkeypatch.setattr(emotes, 'emojidict', {
+            name: emoji for name, emoji in PINNED_EMOJIS.items() if name not in emotes.QUALITY_HEALTH_ENERGY_POISON.values()
+        })
+    for back, fore in product(PATHS, [*PATHS, None, '']):
+        expected = old_identify(back, pagename, foreground(fore))
+        assert emotes.emoji_for(back, foreground(fore), pagename) == expected, (back, fore)
+
+
+def test_quality_overlays_are_not_thrown_away():
+    gold = foreground(ICONS.format('Gold_Quality_Icon.png'))
+    assert emotes.emoji_for(ICONS.format('Energy.png'), gold) == ':GOLD_ENERGY:'
+    assert emotes.emoji_for(ICONS.format('Parsnip.png'), gold, 'Parsnip') == ':coin:'
+    assert emotes.emoji_for(ICONS.format('Parsnip.png'), gold) is None
@@ -0,0 +1,50 @@
+import urllib.parse
+
+import pytest
+
+from src.titles import TitleIndex
+
+from .fakewiki import FakeWiki, load_page
+
+
+def quoted(title: str) -> str:
+    # how the wiki command hands queries to search()
+    return urllib.parse.quote(title.replace(' ', '_'))
+
+
+@pytest.mark.parametrize('backend', ['html', 'api'])
+def test_missing_page_is_remembered(make_cog, run_wiki, backend):
+    wiki = FakeWiki({'Parsnip': load_page('parsnip')})
+
+    async def scenario(url):
+        cog = make_cog(url, backend=backend)
+        first = await cog.search(quoted("Qi's Challenge"))
+        requests = len(wiki.requests)
+        second = await cog.search(quoted("Qi's Challenge"))
+
+        assert requests > 0
+        # the second lookup never left the bot
+        assert len(wiki.requests) == requests
+        for emb in (first, second):
+            assert emb.title == 'No page found - Stardew Valley Wiki'
+            assert "Qi's Challenge" in emb.description
+            assert emb.url.startswith(f'{url}/mediawiki/index.php?search=')
+        assert cog.cache.is_missing("Qi's Challenge")
+
+    run_wiki(wiki, scenario)
+
+
+def test_created_page_is_forgotten(make_cog, run_wiki):
+    wiki = FakeWiki({})
+
+    async def scenario(url):
+        cog = make_cog(url)
+        await cog.search(quoted("Qi's Challenge"))
+        # the hourly title refresh finds the page has been made since
+        assert cog.cache.forget_missing(TitleIndex(["Qi's Challenge"])) == 1
+        wiki.edit("Qi's Challenge", load_page('parsnip'))
+        emb = await cog.search(quoted("Qi's Challenge"))
+
+        assert emb.title == 'Parsnip - Stardew Valley Wiki'
+
+    run_wiki(wiki, scenario)
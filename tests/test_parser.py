@@ -0,0 +1,121 @@
+import importlib.util
+import json
+import os
+
+import bs4
+import pytest
+
+from src import parser
+
+from .fakewiki import FIXTURES, load_page
+
+PAGES = sorted(name[:-len('.html')] for name in os.listdir(os.path.join(FIXTURES, 'pages')))
+
+
+def golden(name: str) -> dict:
+    # written by the parser as it was before the single pass infobox scan, with the same
+    # pinned hyperlinks and emojis, so these check the later rewrites give identical embeds
+    with open(os.path.join(FIXTURES, 'golden', f'{name}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def page_url(name: str) -> str:
+    return f'https://stardewvalleywiki.com/{name.title()}'
+
+
+def installed(backend: str) -> str:
+    if backend not in parser.available_backends():
+        pytest.skip(f'{backend} is not installed')
+    return backend
+
+
+@pytest.mark.parametrize('backend', parser.BACKENDS)
+@pytest.mark.parametrize('name', PAGES)
+def test_matches_golden(name, backend):
+    # every backend has to give the same embed, not just the one picked here
+    assert parser.parse_page(page_url(name), load_page(name), installed(backend)) == golden(name)
+
+
+def test_pick_backend():
+    available = parser.available_backends()
+    assert available[-1] == 'html.parser'
+    assert parser.pick_backend('html.parser') == 'html.parser'
+    assert parser.pick_backend('not-a-parser') == available[0]
+    assert parser.pick_backend(None) == available[0]
+
+
+def test_api_title_is_used_for_the_heading():
+    payload = parser.parse_page(page_url('catfish'), load_page('catfish'), title='Catfish (fish)')
+    assert payload['title'] == 'Catfish (fish) - Stardew Valley Wiki'
+    assert payload['fields'] == golden('catfish')['fields']
+
+
+def infobox(rows: str) -> bs4.element.Tag:
+    return parser.make_soup(f'<table id="infoboxtable"><tbody>{rows}</tbody></table>', 'html.parser').table # type: ignore
+
+
+def test_scan_infobox_stops_at_the_footer():
+    table = infobox(
+        '<tr><td id="infoboxsection">Season</td><td id="infoboxdetail">Spring</td></tr>'
+        '<tr><td><table style="width:101%;"><tr><td id="infoboxsection">Used In</td><td id="infoboxdetail">Bundles</td></tr></table></td></tr>'
+        '<tr><td id="infoboxsection">After</td><td id="infoboxdetail">never</td></tr>'
+    )
+    assert [(section, detail.text) for section, detail in parser.scan_infobox(table)] == [('Season', 'Spring')]
+
+
+def test_scan_infobox_pairs_nested_rows_like_the_row_probes():
+    # the outer row finds the inner row's cells first, and the inner row is visited on its own too
+    table = infobox(
+        '<tr><td><table><tr><td id="infoboxsection">Inner</td><td id="infoboxdetail">a</td></tr></table></td></tr>'
+        '<tr><td id="infoboxsection">Empty</td></tr>'
+        '<tr><td id="infoboxsection"></td><td id="infoboxdetail">no section</td></tr>'
+    )
+    assert [(section, detail.text) for section, detail in parser.scan_infobox(table)] == [('Inner', 'a'), ('Inner', 'a')]
+
+
+@pytest.mark.parametrize('detail, expected', [
+    ('<span class="no-wrap"><a href="/Fall">Fall</a> 13</span>', '[Fall](https://stardewvalleywiki.com/Fall) 13'),
+    ('<span style="display: none;">zz</span>Plain   text', 'Plain   text'),
+    ('<span class="nametemplate"><a href="/Sam">Sam</a></span> <span class="nametemplate">Abigail</span>', '[Sam](https://stardewvalleywiki.com/Sam), Abigail'),
+    ('<p>one</p><p class="mw-empty-elt"></p><p>two</p>', 'one, two'),
+    # text before the first link has always been dropped, only what follows each link is kept
+    ('Just <a href="/Link">a link</a> (here', '[a link](https://stardewvalleywiki.com/Link) (here)'),
+])
+def test_extract_detail(detail, expected):
+    soup = parser.make_soup(f'<table><tr><td id="infoboxdetail">{detail}</td></tr></table>', 'html.parser')
+    assert parser.extract_detail(soup, 'Section', soup.td, 'Page') == expected # type: ignore
+
+
+# bs4 4.13 replaced the function-as-name strainer with ElementFilter, each version only supports its own
+HAS_ELEMENT_FILTER = importlib.util.find_spec('bs4.filter') is not None
+
+
+@pytest.mark.parametrize('kind', ['element_filter', 'soup_strainer'])
+@pytest.mark.parametrize('name', PAGES)
+def test_strainers_match_golden(name, kind, monkeypatch):
+    if (kind == 'element_filter') != HAS_ELEMENT_FILTER:
+        pytest.skip(f'bs4 {bs4.__version__} strains with {"element_filter" if HAS_ELEMENT_FILTER else "soup_strainer"}')
+    strainer = getattr(parser, kind)
+    monkeypatch.setattr(parser, 'LEAD_STRAINER', strainer(parser._lead_tags))
+    monkeypatch.setattr(parser, 'CONTENT_STRAINER', strainer(parser._content_tags))
+
+    html = load_page(name)
+    if parser.INFOBOX_MARKER not in html:
+        # strained through the fallback for a stray marker instead
+        html = html.replace('<body', f'<!-- {parser.INFOBOX_MARKER} --><body', 1)
+    for backend in parser.available_backends():
+        assert parser.parse_page(page_url(name), html, backend) == golden(name)
+
+
+@pytest.mark.parametrize('name', ['parsnip', 'festivals', 'farm'])
+def test_pages_are_read_once(name, monkeypatch):
+    calls = []
+    make_soup = parser.make_soup
+
+    def counting(html, backend=None, parse_only=None):
+        calls.append(parse_only)
+        return make_soup(html, backend, parse_only)
+
+    monkeypatch.setattr(parser, 'make_soup', counting)
+    parser.parse_page(page_url(name), load_page(name))
+    assert len(calls) == 1
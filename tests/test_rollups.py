@@ -0,0 +1,83 @@
+import asyncio
+from collections import Counter
+import datetime
+import random
+
+import pytest
+
+pytest.importorskip('environ')
+tortoise = pytest.importorskip('tortoise')
+
+
+def batch(rng: random.Random, start: int, size: int) -> list:
+    # late in the UTC day, so a batch spans midnight
+    base = datetime.datetime(2024, 1, 1, 23, 0, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            'guild': rng.choice([None, 1, 2]),
+            'channel': 5,
+            'author': rng.choice([10, 11, 12]),
+            'used': base + datetime.timedelta(minutes=rng.randrange(180)),
+            'prefix': '!',
+            'command': rng.choice(['wiki', 'help']),
+            'failed': rng.random() < .3,
+            'app_command': False,
+            'is_guild_install': True,
+            'is_user_install': rng.random() < .2,
+            'args': [],
+            'kwargs': {},
+            'command_id': command_id,
+            'transaction_id': None,
+        }
+        for command_id in range(start, start + size)
+    ]
+
+
+def test_batches_are_counted_into_every_rollup():
+    async def scenario():
+        await tortoise.Tortoise.init(db_url='sqlite://:memory:', modules={'my_app': ['cogs.models']})
+        try:
+            await tortoise.Tortoise.generate_schemas()
+            from cogs.models import AuthorRollups, CommandRollups, Commands
+
+            rng = random.Random(3)
+            batches = [batch(rng, n * 50, 50) for n in range(4)]
+            for each in batches:
+                await Commands.bulk_insert(each)
+            rows = [row for each in batches for row in each]
+
+            by_command = {(r.guild_id, r.command, r.is_user_install, r.day): r.uses for r in await CommandRollups.all()}
+            by_author = {(r.guild_id, r.author_id, r.day): r.uses for r in await AuthorRollups.all()}
+            first = await AuthorRollups.get(guild_id=1, author_id=10, day=datetime.date(2024, 1, 1))
+        finally:
+            await tortoise.Tortoise.close_connections()
+
+        assert by_command == Counter((row['guild'] or 0, row['command'], row['is_user_install'], row['used'].date()) for row in rows)
+        assert by_author == Counter((row['guild'] or 0, row['author'], row['used'].date()) for row in rows)
+        assert first.first_used == min(
+            row['used'] for row in rows
+            if row['guild'] == 1 and row['author'] == 10 and row['used'].date() == datetime.date(2024, 1, 1)
+        )
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize('driver, placeholders', [
+    ('asyncpg', '$1, $2, $3, $4, $5, $6, $7'),
+    ('psycopg', '%s, %s, %s, %s, %s, %s, %s'),
+    ('sqlite', '?, ?, ?, ?, ?, ?, ?'),
+])
+def test_upsert_uses_the_drivers_placeholders(driver, placeholders):
+    from cogs.models import AuthorRollups
+
+    assert f'VALUES ({placeholders})' in AuthorRollups.upsert_query(driver)
+
+
+def test_row_key_follows_the_key_columns():
+    from cogs.models import AuthorRollups, CommandRollups
+
+    day = datetime.date(2024, 1, 1)
+    row = {'guild_id': None, 'author_id': 10, 'command': 'wiki', 'is_user_install': None}
+    # a command used in a DM is counted under guild 0
+    assert CommandRollups.row_key(row, day) == (0, 'wiki', False, day)
+    assert AuthorRollups.row_key({**row, 'guild_id': 2}, day) == (2, 10, day)
@@ -0,0 +1,52 @@
+import os
+
+from src.spool import Spool
+
+
+def spool_with(tmp_path, max_bytes: int, segments: int) -> Spool:
+    spool = Spool(str(tmp_path / 'spool.jsonl'), max_bytes)
+    for command_id in range(segments):
+        spool.append({'command_id': command_id, 'command': 'wiki'})
+        spool.rotate()
+    return spool
+
+
+def test_rows_are_replayed_from_segments(tmp_path):
+    spool = spool_with(tmp_path, 1024 * 1024, 3)
+    assert [spool.read(segment) for segment in spool.segments()] == [[{'command_id': i, 'command': 'wiki'}] for i in range(3)]
+
+    # a restart turns whatever was in the active file into a segment too
+    spool.append({'command_id': 3, 'command': 'wiki'})
+    spool.close()
+    assert len(Spool(spool.path, spool.max_bytes).segments()) == 4
+
+
+def test_set_aside_segments_are_not_replayed(tmp_path):
+    spool = spool_with(tmp_path, 1024 * 1024, 2)
+    first, second = spool.segments()
+    failed = spool.set_aside(first)
+
+    assert spool.segments() == [second]
+    assert spool.failed_segments() == [failed]
+    assert spool.size() == os.path.getsize(failed) + os.path.getsize(second)
+
+
+def test_set_aside_segments_count_towards_the_limit(tmp_path):
+    spool = spool_with(tmp_path, 1024 * 1024, 4)
+    for segment in spool.segments()[:3]:
+        spool.set_aside(segment)
+    row_bytes = os.path.getsize(spool.segments()[0])
+
+    # room for two segments: the oldest failed ones go, the waiting one is kept
+    spool.max_bytes = 2 * row_bytes
+    spool.rotate()
+    assert len(spool.failed_segments()) == 1
+    assert len(spool.segments()) == 1
+    assert spool.dropped == 2
+
+    # past even that, the set aside segment goes before the waiting one
+    spool.max_bytes = row_bytes
+    spool.rotate()
+    assert spool.failed_segments() == []
+    assert [row['command_id'] for row in spool.read(spool.segments()[0])] == [3]
+    assert spool.dropped == 3
@@ -0,0 +1,109 @@
+import re
+import urllib.parse
+
+import pytest
+
+from src import text
+
+
+def old_collapse(s: str) -> str:
+    # what the parser did before collapse_whitespace
+    s = s.replace('\t', ' ').replace('\xa0', ' ')
+    while '  ' in s:
+        s = s.replace('  ', ' ')
+    return s.replace('\n', '')
+
+
+WHITESPACE = [
+    '',
+    'plain',
+    'two  spaces',
+    'tab\tand\xa0nbsp',
+    ' \t\xa0 mixed \xa0\t run ',
+    'line\nbreak',
+    'space \n space',
+    'a' + ' ' * 500 + 'b',
+    '\n\n\t\t\xa0\xa0',
+]
+
+
+@pytest.mark.parametrize('s', WHITESPACE)
+def test_collapse_whitespace_matches_the_replace_loop(s):
+    assert text.collapse_whitespace(s) == old_collapse(s)
+
+
+@pytest.mark.parametrize('price, expected', [
+    ('<span data-sort-value="35">35g</span>', '<span >35g</span>'),
+    ('data-sort-value="Gold star-2_1" 50g', ' 50g'),
+    ('data-sort-value="a" data-sort-value="b"', ' '),
+    # quotes or punctuation in the value were never matched
+    ('data-sort-value="1.5"', 'data-sort-value="1.5"'),
+    ('no sort value', 'no sort value'),
+])
+def test_clean_sell_price(price, expected):
+    assert text.clean_sell_price(price) == expected
+
+
+@pytest.mark.parametrize('href', ['/Parsnip', 'Parsnip', '/File:Parsnip.png', '//stardewvalleywiki.com/Fall', 'https://example.com/x', '#Spring'])
+def test_absolute_url_matches_urljoin(href):
+    assert text.absolute_url(href) == urllib.parse.urljoin('https://stardewvalleywiki.com', href)
+
+
+@pytest.mark.parametrize('content, links', [
+    ('[[Parsnip]]', ['Parsnip']),
+    ('try [[Parsnip]] and [[Abigail]] today', ['Parsnip', 'Abigail']),
+    ('[[Qi\'s Challenge]]', ["Qi's Challenge"]),
+    ('[[]]', []),
+    ('[ [Parsnip]]', []),
+])
+def test_link_re(content, links):
+    assert text.LINK_RE.findall(content) == links
+    assert text.LINK_RE.findall(content) == re.findall(r'\[\[(.+?)\]\]', content)
+
+
+@pytest.mark.parametrize('content, bad', [
+    ('[[Parsnip]](https://stardewvalleywiki.com/Parsnip)', True),
+    ('see [[Parsnip]] (the crop)', False),
+    ('[[Parsnip]] and [[Fall]](https://stardewvalleywiki.com/Fall)', True),
+    ('[[Parsnip]] and [x](y)', False),
+    ('[[Parsnip]]', False),
+])
+def test_bad_link_re(content, bad):
+    assert bool(text.BAD_LINK_RE.search(content)) is bad
+    assert bool(text.BAD_LINK_RE.search(content)) is bool(re.findall(r'\[\[.+\]\]\(.+\)', content))
+
+
+def test_old_wiki_link_re():
+    content = 'see https://stardewcommunitywiki.com/Parsnip_(crop)#Growth and https://stardewcommunitywiki.com/Category:Qi%27s-Items.'
+    assert text.OLD_WIKI_LINK_RE.findall(content) == [
+        'https://stardewcommunitywiki.com/Parsnip_',
+        # stops at the first character outside the class, a full stop here
+        'https://stardewcommunitywiki.com/Category:Qi%27s-Items',
+    ]
+    assert text.OLD_WIKI_LINK_RE.findall('https://stardewvalleywiki.com/Parsnip') == []
+
+
+@pytest.mark.parametrize('link, target', [
+    ('Parsnip', 'Parsnip'),
+    ('Parsnip|the root', 'Parsnip'),
+    ('Parsnip#Seeds', 'Parsnip'),
+    (' Parsnip #Seeds|seeds ', 'Parsnip'),
+    ('#Seeds', ''),
+])
+def test_link_target(link, target):
+    assert text.link_target(link) == target
+
+
+def test_split_message_keeps_under_the_limit():
+    lines = [f'<https://stardewvalleywiki.com/Page_{n}>' for n in range(100)]
+    messages = text.split_message(lines)
+    assert len(messages) > 1
+    assert all(len(message) <= text.MESSAGE_LIMIT for message in messages)
+    # nothing lost, reordered or split mid line
+    assert '\n'.join(messages).split('\n') == lines
+
+
+def test_split_message_fills_each_message():
+    assert text.split_message(['aaaa', 'bbbb', 'cc', 'd'], limit=9) == ['aaaa\nbbbb', 'cc\nd']
+    assert text.split_message(['a' * 9, 'b'], limit=9) == ['a' * 9, 'b']
+    assert text.split_message([]) == []
@@ -0,0 +1,91 @@
+import pytest
+
+from src.titles import TitleIndex, normalise_title
+
+TITLES = ['Prismatic Shard', 'Shard', 'Shane', 'Sea Shell', 'Frozen Tear', "Shane's House", 'Fire Quartz']
+
+
+@pytest.fixture
+def index() -> TitleIndex:
+    return TitleIndex(TITLES)
+
+
+@pytest.mark.parametrize('query', ['Prismatic Shard', 'prismatic shard', '  PRISMATIC   shard ', 'Prismatic_Shard'])
+def test_resolve_ignores_case_and_whitespace(index, query):
+    assert index.resolve(query) == 'Prismatic Shard'
+    assert query in index
+
+
+def test_resolve_unknown_title(index):
+    assert index.resolve('Prismatic') is None
+    assert 'Prismatic' not in index
+
+
+def test_first_spelling_of_a_title_wins():
+    index = TitleIndex(['Parsnip', 'parsnip', 'Parsnip'])
+    assert len(index) == 2
+    assert index.resolve('PARSNIP') == 'Parsnip'
+
+
+def test_normalise_title():
+    assert normalise_title(" Qi's_Walnut   Room ") == "qi's walnut room"
+
+
+def test_titles_starting_with_the_query_come_first(index):
+    # then titles with a later word starting with it, each title once
+    assert index.complete('sh') == ['Shane', "Shane's House", 'Shard', 'Prismatic Shard', 'Sea Shell']
+
+
+def test_a_title_matching_twice_is_suggested_once(index):
+    assert index.complete('s') == ['Sea Shell', 'Shane', "Shane's House", 'Shard', 'Prismatic Shard']
+
+
+def test_complete_stops_at_the_limit(index):
+    assert index.complete('sh', limit=2) == ['Shane', "Shane's House"]
+
+
+def test_empty_query_lists_titles_in_wiki_order(index):
+    assert index.complete('') == TITLES
+    assert index.complete('   ', limit=3) == TITLES[:3]
+
+
+def test_fuzzy_ranks_by_edit_distance(index):
+    assert index.fuzzy('prismatic shrd', limit=2) == ['Prismatic Shard', 'Shard']
+
+
+def test_fuzzy_needs_a_shared_trigram(index):
+    assert index.fuzzy('qqqq') == []
+
+
+@pytest.mark.parametrize('query, meant', [
+    ('prismatic shrd', 'Prismatic Shard'),
+    ('Prismatik Shard', 'Prismatic Shard'),
+    ('Frozen Taer', 'Frozen Tear'),
+    ('Shrd', 'Shard'),
+])
+def test_closest_corrects_typos(index, query, meant):
+    assert index.closest(query) == meant
+
+
+@pytest.mark.parametrize('query', [
+    # too short to tell a typo from a different word
+    'Shd',
+    # three edits, ten characters only allow two
+    'Froz Tearr',
+    'qqqqqq',
+])
+def test_closest_gives_up_when_unsure(index, query):
+    assert index.closest(query) is None
+
+
+def test_complete_falls_back_to_fuzzy_prefixes(index):
+    # nothing starts with the misspelling, so the titles it is probably the start of are offered
+    assert index.complete('prismatc')[0] == 'Prismatic Shard'
+    assert index.complete('Frozn')[0] == 'Frozen Tear'
+
+
+def test_fuzzy_fallback_only_tops_up(index):
+    matches = index.complete('sha', limit=3)
+    assert matches == ['Shane', "Shane's House", 'Shard']
+    # short queries match too much by accident to be worth correcting
+    assert index.complete('zq') == []